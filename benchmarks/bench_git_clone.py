@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# git_clone through local mirrors on file:// repositories with nested submodules:
+# checks that every checkout is complete and compares clone time with and without a warm mirror.
+#
+#   python3 benchmarks/bench_git_clone.py   # exit 1 if any checkout is missing submodule content
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyfastogt import utils
+
+GIT_ALLOW_FILE = ['git', '-c', 'protocol.file.allow=always']
+
+
+def git(cwd: str, *args):
+    subprocess.check_call(GIT_ALLOW_FILE + list(args), cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_repo(path: str, files: int, submodules=()) -> str:
+    os.makedirs(path)
+    git(path, 'init', '--quiet')
+    git(path, 'config', 'user.email', 'bench@example.com')
+    git(path, 'config', 'user.name', 'bench')
+    for i in range(files):
+        with open(os.path.join(path, 'file_{0}.txt'.format(i)), 'w') as f:
+            f.write('{0}\n'.format(i) * 512)
+    for name, url in submodules:
+        git(path, 'submodule', '--quiet', 'add', url, name)
+    git(path, 'add', '-A')
+    git(path, 'commit', '--quiet', '-m', 'initial')
+    return 'file://' + path
+
+
+def check_checkout(directory: str, remove_dot_git: bool) -> list:
+    errors = []
+    for path in ['file_0.txt', 'sub/file_0.txt', 'sub/nested/file_0.txt']:
+        if not os.path.isfile(os.path.join(directory, path)):
+            errors.append('{0}: missing {1}'.format(directory, path))
+    if remove_dot_git and os.path.exists(os.path.join(directory, '.git')):
+        errors.append('{0}: .git not removed'.format(directory))
+    return errors
+
+
+def timed_clone(work_dir: str, url: str, remove_dot_git: bool, mirror_dir):
+    clone_dir = tempfile.mkdtemp(dir=work_dir)
+    pwd = os.getcwd()
+    env = dict(os.environ)
+    if not mirror_dir:
+        # upstream submodules are file:// here, plain clones need it allowed too; mirrored clones must not
+        os.environ.update({'GIT_CONFIG_COUNT': '1', 'GIT_CONFIG_KEY_0': 'protocol.file.allow',
+                           'GIT_CONFIG_VALUE_0': 'always'})
+    os.chdir(clone_dir)
+    try:
+        start = time.perf_counter()
+        directory = utils.git_clone(url, None, remove_dot_git, mirror_dir)
+        return time.perf_counter() - start, directory
+    finally:
+        os.chdir(pwd)
+        os.environ.clear()
+        os.environ.update(env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark git_clone through local mirrors')
+    parser.add_argument('--files', type=int, default=200, help='files per repository')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='pyfastogt_git_')
+    errors = []
+    try:
+        nested_url = make_repo(os.path.join(work_dir, 'nested'), args.files)
+        sub_url = make_repo(os.path.join(work_dir, 'sub'), args.files, [('nested', nested_url)])
+        url = make_repo(os.path.join(work_dir, 'super'), args.files, [('sub', sub_url)])
+        mirror_dir = os.path.join(work_dir, 'mirrors')
+
+        for remove_dot_git in [True, False]:
+            for title, mirror in [('no mirror', None), ('cold mirror', mirror_dir), ('warm mirror', mirror_dir)]:
+                if title == 'cold mirror':
+                    shutil.rmtree(mirror_dir, ignore_errors=True)
+                try:
+                    elapsed, directory = timed_clone(work_dir, url, remove_dot_git, mirror)
+                except utils.CommonError as ex:
+                    errors.append('{0}: {1}'.format(title, ex))
+                    continue
+                errors.extend(check_checkout(directory, remove_dot_git))
+                print('remove_dot_git={0!s:5} {1:12} {2:8.3f}s'.format(remove_dot_git, title, elapsed))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
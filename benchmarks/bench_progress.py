@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Progress parsing throughput: per-line str parsing vs raw bytes parsing with coalesced callbacks.
+# Uses a recorded log if --log is given, otherwise synthesizes make/ninja/cmake style output.
+
+import argparse
+import os
+import sys
+import time
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyfastogt.run_command import Message, MessageType, MakePolicy, NinjaPolicy, CmakePolicy
+
+
+def synthesize_log(kind: str, lines: int) -> list:
+    result = []
+    for i in range(lines):
+        if kind == 'ninja':
+            result.append('[{0}/{1}] Building CXX object src/file_{0}.cpp.o\n'.format(i + 1, lines).encode())
+        elif kind == 'make':
+            percent = (i * 100) // lines
+            if i % 3:
+                result.append('cc -O2 -c src/file_{0}.c -o src/file_{0}.o\n'.format(i).encode())
+            else:
+                result.append('[{0:3d}%] Building C object src/file_{1}.c.o\n'.format(percent, i).encode())
+        else:
+            result.append('-- Looking for include file header_{0}.h - found\n'.format(i).encode())
+    return result
+
+
+def load_log(path: str) -> list:
+    with open(path, 'rb') as f:
+        return f.readlines()
+
+
+def make_policy(kind: str, cb, coalesce_interval=None):
+    if kind == 'ninja':
+        return NinjaPolicy(cb, coalesce_interval)
+    elif kind == 'make':
+        return MakePolicy(cb, coalesce_interval)
+    return CmakePolicy(cb, coalesce_interval)
+
+
+def bench_decoded(kind: str, log: list):
+    calls = [0]
+
+    def cb(progress, message):
+        calls[0] += 1
+
+    policy = make_policy(kind, cb)
+    start = time.perf_counter()
+    for line in log:
+        policy.process(Message(line.strip().decode('utf-8'), MessageType.MESSAGE))
+    return time.perf_counter() - start, calls[0]
+
+
+def bench_raw(kind: str, log: list, interval: float):
+    calls = [0]
+
+    def cb(progress, message):
+        calls[0] += 1
+
+    policy = make_policy(kind, cb, interval)
+    start = time.perf_counter()
+    for line in log:
+        policy.process_raw(line)
+    return time.perf_counter() - start, calls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark build progress parsing')
+    parser.add_argument('--kind', choices=['make', 'ninja', 'cmake'], nargs='+', default=['make', 'ninja', 'cmake'])
+    parser.add_argument('--lines', type=int, default=2000000)
+    parser.add_argument('--log', help='recorded build log, used for every --kind')
+    parser.add_argument('--interval', type=float, default=0.1, help='coalesce interval in seconds')
+    args = parser.parse_args()
+
+    for kind in args.kind:
+        log = load_log(args.log) if args.log else synthesize_log(kind, args.lines)
+        decoded_time, decoded_calls = bench_decoded(kind, log)
+        raw_time, raw_calls = bench_raw(kind, log, args.interval)
+        print('{0}: {1} lines, decoded: {2:.3f}s ({3} callbacks), raw+coalesced: {4:.3f}s ({5} callbacks)'.format(
+            kind, len(log), decoded_time, decoded_calls, raw_time, raw_calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Signature backends: key generation, sign and verify throughput plus per-operation latency percentiles
+# for RSA (PKCS#1 v1.5, SHA-1) vs ECDSA P-256 and Ed25519ph.
+
+import argparse
+import os
+import sys
+import time
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyfastogt.verify_sign import Generator, Sign, Verify, RSA_ALGORITHM, ECDSA_P256_ALGORITHM, ED25519PH_ALGORITHM
+
+
+def latencies(func, count: int) -> list:
+    result = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        result.append(time.perf_counter() - start)
+    return sorted(result)
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(name: str, values: list):
+    total = sum(values)
+    print('  {0:8} {1:10.1f} ops/s  p50: {2:8.3f}ms  p99: {3:8.3f}ms'.format(
+        name, len(values) / total if total else 0.0, percentile(values, 0.5) * 1000, percentile(values, 0.99) * 1000))
+
+
+def bench_algorithm(algorithm: str, bits_length: int, count: int, keys: int, size: int):
+    print('{0}{1}:'.format(algorithm, ' {0}'.format(bits_length) if algorithm == RSA_ALGORITHM else ''))
+    generator = Generator(bits_length, algorithm)
+    report('generate', latencies(generator.generate, keys))
+
+    private_key, public_key = generator.generate()
+    signer = Sign(public_key, private_key)
+    verifier = Verify(public_key)
+    data = os.urandom(size)
+    signature = signer.sign(data)
+    report('sign', latencies(lambda: signer.sign(data), count))
+    report('verify', latencies(lambda: verifier.verify(data, signature), count))
+    print('  signature: {0} bytes, public key: {1} bytes'.format(len(signature), len(public_key)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark signature backends')
+    parser.add_argument('--algorithm', nargs='+', default=[RSA_ALGORITHM, ECDSA_P256_ALGORITHM, ED25519PH_ALGORITHM])
+    parser.add_argument('--rsa-bits', type=int, nargs='+', default=[1024, 2048, 3072])
+    parser.add_argument('--count', type=int, default=500, help='sign/verify operations per algorithm')
+    parser.add_argument('--keys', type=int, default=5, help='generated keys per algorithm')
+    parser.add_argument('--size', type=int, default=1024, help='signed message size in bytes')
+    args = parser.parse_args()
+
+    for algorithm in args.algorithm:
+        for bits_length in (args.rsa_bits if algorithm == RSA_ALGORITHM else [0]):
+            bench_algorithm(algorithm, bits_length, args.count, args.keys, args.size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Import-time regression check: `python -X importtime -c "import pyfastogt.<module>"` must not load
+# heavy dependencies that are only needed on first use (deterministic), and must stay under a time
+# budget of ~6x the time measured on a developer machine (noted per module), so only gross regressions trip it.
+#
+#   python3 benchmarks/import_budget.py                   # exit 1 on forbidden import or over budget
+#   python3 benchmarks/import_budget.py --budget-scale 2  # slower machines
+#   python3 benchmarks/import_budget.py --skip-time       # forbidden imports only, for noisy CI hosts
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# module: (budget ms, modules that must not be imported)
+BUDGETS = {
+    'utils': (150, ['certifi', 'ssl', 'validate_email', 'urllib.request', 'tarfile', 'json', 'asyncio']),  # 20ms
+    'verify_sign': (30, ['Crypto', 'multiprocessing', 'json']),  # 4.5ms
+    'email_validation': (200, ['validate_email', 'ssl', 'http.client']),  # 31ms
+    'run_command': (80, ['asyncio']),  # 13ms
+    'system_info': (90, []),  # 15ms
+    'trace': (80, ['json']),  # 13ms
+    'build_profile': (80, []),  # 13ms
+    'build_utils': (140, ['multiprocessing', 'concurrent.futures.process', 'json', 'tempfile']),  # 23ms
+}
+
+IMPORT_TIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(module: str) -> dict:
+    """
+    Module name -> cumulative import time in us, for module and everything it imported
+    (interpreter startup imports are excluded)
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {0}'.format(module)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stderr
+    block = {}
+    for line in output.decode('utf-8', 'replace').splitlines():
+        res = IMPORT_TIME_RE.match(line)
+        if not res:
+            continue
+        block[res.group(4)] = int(res.group(2))
+        if len(res.group(3)) == 1:  # top level import, children are listed before it
+            if res.group(4) == module:
+                return block
+            block = {}
+    return block
+
+
+def check_module(module: str, budget: float, forbidden: list, repeat: int) -> list:
+    full_name = 'pyfastogt.' + module
+    errors = []
+    best = None
+    for _ in range(repeat):
+        times = import_times(full_name)
+        best = min(best, times[full_name]) if best is not None else times[full_name]
+        for name in forbidden:
+            if any(x == name or x.startswith(name + '.') for x in times):
+                errors.append('{0} imports {1}'.format(full_name, name))
+        if errors:
+            break
+
+    ms = best / 1000.0
+    if budget is not None and ms > budget:
+        errors.append('{0} import took {1:.1f}ms, budget {2:.1f}ms'.format(full_name, ms, budget))
+    budget_text = '{0:.1f}ms'.format(budget) if budget is not None else 'skipped'
+    print('{0:35} {1:8.1f}ms (budget {2}) {3}'.format(full_name, ms, budget_text, 'FAIL' if errors else 'ok'))
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check import time of pyfastogt modules')
+    parser.add_argument('modules', nargs='*', help='modules to check, all by default')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='budget multiplier')
+    parser.add_argument('--repeat', type=int, default=5, help='best of repeat runs is compared with budget')
+    parser.add_argument('--skip-time', action='store_true', help='check forbidden imports only')
+    args = parser.parse_args()
+
+    errors = []
+    for module, (budget, forbidden) in BUDGETS.items():
+        if args.modules and module not in args.modules:
+            continue
+        try:
+            budget = None if args.skip_time else budget * args.budget_scale
+            errors.extend(check_module(module, budget, forbidden, args.repeat))
+        except subprocess.CalledProcessError as ex:
+            errors.append('import pyfastogt.{0} failed: {1}'.format(module, ex.stderr.decode('utf-8', 'replace')))
+
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# Benchmarks of pyfastogt hot paths.
+#
+#   python3 benchmarks/run.py --save baseline.json     # record baseline
+#   python3 benchmarks/run.py --compare baseline.json  # exit 1 if any benchmark regressed
+#
+# Each benchmark reports the best of --repeat runs; benchmarks whose third-party dependencies
+# are not installed are reported as skipped, and count as failed when compared with a baseline that has them.
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+
+    return decorator
+
+
+class Skip(Exception):
+    pass
+
+
+def _import(module: str):
+    return __import__('pyfastogt.' + module, fromlist=[module])
+
+
+def _is_own_import_error(ex: ImportError) -> bool:
+    return (ex.name or '').split('.')[0] == 'pyfastogt'
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _lines_file(work_dir: str, lines: int) -> str:
+    path = os.path.join(work_dir, 'lines_{0}.txt'.format(lines))
+    if not os.path.exists(path):
+        with open(path, 'w') as f:
+            for i in range(lines):
+                f.write('user{0}@domain{1}.com\n'.format(i, i % 1000))
+    return path
+
+
+@benchmark('read_file_line_by_line_to_list')
+def bench_read_list(work_dir: str, scale: float):
+    utils = _import('utils')
+    return _timed(utils.read_file_line_by_line_to_list, _lines_file(work_dir, int(10000000 * scale)))
+
+
+@benchmark('read_file_line_by_line_to_set')
+def bench_read_set(work_dir: str, scale: float):
+    utils = _import('utils')
+    return _timed(utils.read_file_line_by_line_to_set, _lines_file(work_dir, int(10000000 * scale)))
+
+
+@benchmark('binary_search_number')
+def bench_binary_search(work_dir: str, scale: float):
+    utils = _import('utils')
+    array = list(range(0, int(10000000 * scale) * 2, 2))
+    rnd = random.Random(0)
+    needles = [rnd.randrange(0, len(array) * 2) for _ in range(int(100000 * scale) or 1)]
+
+    def run():
+        for needle in needles:
+            utils.binary_search_number(needle, array)
+
+    return _timed(run)
+
+
+@benchmark('is_role_based_email')
+def bench_role_based_email(work_dir: str, scale: float):
+    utils = _import('utils')
+    prefixes = ['noreply', 'support', 'admin', 'postmaster', 'john', 'jane.doe', 'info']
+    emails = ['{0}@example{1}.com'.format(prefixes[i % len(prefixes)], i % 100) for i in range(int(1000000 * scale))]
+
+    def run():
+        for email in emails:
+            utils.is_role_based_email(email)
+
+    return _timed(run)
+
+
+def _bench_policy(policy_name: str, kind: str, scale: float, raw=False):
+    run_command = _import('run_command')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_progress import synthesize_log
+
+    log = synthesize_log(kind, int(2000000 * scale))
+    policy = getattr(run_command, policy_name)(lambda progress, message: None, 0.1 if raw else None)
+
+    def run():
+        for line in log:
+            policy.process(run_command.Message(line.strip().decode('utf-8'), run_command.MessageType.MESSAGE))
+
+    def run_raw():  # what the command engine calls for stdout lines
+        for line in log:
+            policy.process_raw(line)
+
+    return _timed(run_raw if raw else run)
+
+
+@benchmark('MakePolicy.process')
+def bench_make_policy(work_dir: str, scale: float):
+    return _bench_policy('MakePolicy', 'make', scale)
+
+
+@benchmark('NinjaPolicy.process')
+def bench_ninja_policy(work_dir: str, scale: float):
+    return _bench_policy('NinjaPolicy', 'ninja', scale)
+
+
+@benchmark('MakePolicy.process_raw')
+def bench_make_policy_raw(work_dir: str, scale: float):
+    return _bench_policy('MakePolicy', 'make', scale, True)
+
+
+@benchmark('NinjaPolicy.process_raw')
+def bench_ninja_policy_raw(work_dir: str, scale: float):
+    return _bench_policy('NinjaPolicy', 'ninja', scale, True)
+
+
+def _sign_keys(algorithm='rsa'):
+    verify_sign = _import('verify_sign')
+    return verify_sign, verify_sign.Generator(2048, algorithm).generate()
+
+
+def _bench_sign(algorithm: str, scale: float):
+    verify_sign, (private_key, public_key) = _sign_keys(algorithm)
+    signer = verify_sign.Sign(public_key, private_key)
+    data = os.urandom(1024)
+
+    def run():
+        for _ in range(int(200 * scale) or 1):
+            signer.sign(data)
+
+    return _timed(run)
+
+
+def _bench_verify(algorithm: str, scale: float):
+    verify_sign, (private_key, public_key) = _sign_keys(algorithm)
+    data = os.urandom(1024)
+    signature = verify_sign.Sign(public_key, private_key).sign(data)
+    verifier = verify_sign.Verify(public_key)
+
+    def run():
+        for _ in range(int(2000 * scale) or 1):
+            verifier.verify(data, signature)
+
+    return _timed(run)
+
+
+@benchmark('Sign.sign')
+def bench_sign(work_dir: str, scale: float):
+    return _bench_sign('rsa', scale)
+
+
+@benchmark('Verify.verify')
+def bench_verify(work_dir: str, scale: float):
+    return _bench_verify('rsa', scale)
+
+
+for _algorithm in ['ecdsa-p256', 'ed25519ph']:
+    benchmark('Sign.sign {0}'.format(_algorithm))(
+        lambda work_dir, scale, algorithm=_algorithm: _bench_sign(algorithm, scale))
+    benchmark('Verify.verify {0}'.format(_algorithm))(
+        lambda work_dir, scale, algorithm=_algorithm: _bench_verify(algorithm, scale))
+
+
+@benchmark('extract_file')
+def bench_extract_file(work_dir: str, scale: float):
+    utils = _import('utils')
+    source_dir = os.path.join(work_dir, 'archive_src')
+    archive = os.path.join(work_dir, 'archive_{0}.tar.gz'.format(scale))
+    if not os.path.exists(archive):
+        os.makedirs(source_dir, exist_ok=True)
+        rnd = random.Random(0)
+        for i in range(int(2000 * scale) or 1):
+            with open(os.path.join(source_dir, 'file_{0}.txt'.format(i)), 'wb') as f:
+                f.write(bytes(rnd.getrandbits(8) for _ in range(256)) * 64)
+        with tarfile.open(archive, 'w:gz') as tar:
+            tar.add(source_dir, 'archive_src')
+
+    extract_dir = tempfile.mkdtemp(dir=work_dir)
+    pwd = os.getcwd()
+    os.chdir(extract_dir)
+    try:
+        return _timed(utils.extract_file, archive, False)
+    finally:
+        os.chdir(pwd)
+
+
+def _import_time(module: str) -> float:
+    code = 'import time; s = time.perf_counter(); import {0}; print(time.perf_counter() - s)'.format(module)
+    try:
+        output = subprocess.check_output([sys.executable, '-c', code], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    except subprocess.CalledProcessError:
+        raise Skip('import {0} failed'.format(module))
+    return float(output)
+
+
+for _module in ['build_profile', 'build_utils', 'email_validation', 'run_command', 'system_info', 'trace', 'utils',
+                'verify_sign']:
+    benchmark('import pyfastogt.{0}'.format(_module))(
+        lambda work_dir, scale, module=_module: _import_time('pyfastogt.' + module))
+
+
+def run_benchmarks(names: list, work_dir: str, scale: float, repeat: int) -> dict:
+    results = {}
+    for name, func in BENCHMARKS:
+        if names and name not in names:
+            continue
+        try:
+            best = min(func(work_dir, scale) for _ in range(repeat))
+        except Skip as ex:
+            print('{0:40} skipped ({1})'.format(name, ex))
+            continue
+        except ImportError as ex:
+            if _is_own_import_error(ex):
+                raise
+            print('{0:40} skipped ({1})'.format(name, ex))
+            continue
+        results[name] = best
+        print('{0:40} {1:10.4f}s'.format(name, best))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, base in baseline.items():
+        value = results.get(name)
+        if value is None:
+            print('{0:40} {1:>11} vs {2:10.4f}s  MISSING'.format(name, '-', base))
+            regressions.append(name)
+            continue
+        ratio = value / base
+        marker = 'REGRESSION' if ratio > threshold else ''
+        print('{0:40} {1:10.4f}s vs {2:10.4f}s  x{3:5.2f} {4}'.format(name, value, base, ratio, marker))
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pyfastogt hot paths')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+    parser.add_argument('--scale', type=float, default=1.0, help='input size multiplier')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'pyfastogt_bench'))
+    parser.add_argument('--save', help='write results as json baseline')
+    parser.add_argument('--compare', help='json baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='allowed slowdown ratio vs baseline')
+    parser.add_argument('--list', action='store_true', help='list benchmarks and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return 0
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = run_benchmarks(args.names, args.work_dir, args.scale, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'scale': args.scale, 'results': results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print('Baseline scale {0} differs from {1}'.format(baseline.get('scale'), args.scale))
+            return 1
+        selected = {name: value for name, value in baseline['results'].items() if not args.names or name in args.names}
+        regressions = compare(results, selected, args.threshold)
+        if regressions:
+            print('Regressed: {0}'.format(', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
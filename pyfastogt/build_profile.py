@@ -0,0 +1,255 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+NINJA_LOG_FILE_NAME = '.ninja_log'
+LAUNCHER_LOG_FILE_NAME = '.pyfastogt_launcher_log'
+PROFILE_REPORT_FILE_NAME = 'build_profile.txt'
+
+
+class BuildTarget(object):
+    def __init__(self, name: str, start: int, end: int):  # ms
+        self.name_ = name
+        self.start_ = start
+        self.end_ = end
+
+    def name(self) -> str:
+        return self.name_
+
+    def start(self) -> int:
+        return self.start_
+
+    def end(self) -> int:
+        return self.end_
+
+    def duration(self) -> int:
+        return self.end_ - self.start_
+
+
+def parse_ninja_log(path: str) -> list:
+    """
+    Targets of the last build recorded in .ninja_log (v5+), one per command
+    """
+    entries = {}
+    last_end = 0
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            start, end, output, cmd_hash = int(fields[0]), int(fields[1]), fields[3], fields[4]
+            if end < last_end:  # new build started, times restart from zero
+                entries = {}
+            last_end = end
+            entries.setdefault((start, end, cmd_hash), []).append(output)
+
+    return [BuildTarget(' '.join(outputs), start, end) for (start, end, _), outputs in entries.items()]
+
+
+def parse_launcher_log(path: str) -> list:
+    targets = []
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t', 2)
+            if len(fields) != 3:
+                continue
+            targets.append(BuildTarget(fields[2], int(fields[0]), int(fields[1])))
+    if not targets:
+        return targets
+
+    origin = min(x.start() for x in targets)
+    return [BuildTarget(x.name(), x.start() - origin, x.end() - origin) for x in targets]
+
+
+def parse_ninja_graph(dot: str) -> dict:
+    """
+    Parse `ninja -t graph` output, returns output -> set of inputs (file paths)
+    """
+    labels = {}
+    edges = {}
+    for line in dot.splitlines():
+        res = re.match(r'\s*"(0x[0-9a-f]+)" \[label="(.*)"(.*)\]', line)
+        if res:
+            if 'shape=ellipse' not in res.group(3):
+                labels[res.group(1)] = res.group(2)
+            continue
+        res = re.match(r'\s*"(0x[0-9a-f]+)" -> "(0x[0-9a-f]+)"', line)
+        if res:
+            edges.setdefault(res.group(2), set()).add(res.group(1))
+
+    def file_inputs(node, seen):
+        result = set()
+        for src in edges.get(node, ()):
+            if src in labels:
+                result.add(labels[src])
+            elif src not in seen:  # rule node, look through it
+                seen.add(src)
+                result.update(file_inputs(src, seen))
+        return result
+
+    return {labels[node]: file_inputs(node, set()) for node in labels}
+
+
+class BuildProfile(object):
+    def __init__(self, targets: list, graph=None):
+        self.targets_ = sorted(targets, key=lambda x: x.start())
+        self.graph_ = graph
+
+    def targets(self) -> list:
+        return self.targets_
+
+    def wall_time(self) -> int:
+        if not self.targets_:
+            return 0
+        return max(x.end() for x in self.targets_) - min(x.start() for x in self.targets_)
+
+    def total_time(self) -> int:
+        return sum(x.duration() for x in self.targets_)
+
+    def average_parallelism(self) -> float:
+        wall = self.wall_time()
+        return self.total_time() / wall if wall else 0.0
+
+    def slowest(self, count=20) -> list:
+        return sorted(self.targets_, key=lambda x: x.duration(), reverse=True)[:count]
+
+    def parallelism_over_time(self, buckets=20) -> list:
+        """
+        List of (bucket start ms, average number of running commands)
+        """
+        wall = self.wall_time()
+        if not wall:
+            return []
+        origin = min(x.start() for x in self.targets_)
+        step = max(wall / buckets, 1)
+        result = []
+        for i in range(buckets):
+            lo = origin + i * step
+            hi = lo + step
+            busy = sum(max(0, min(x.end(), hi) - max(x.start(), lo)) for x in self.targets_)
+            result.append((int(lo - origin), busy / step))
+        return result
+
+    def critical_path(self) -> list:
+        """
+        Longest chain of dependent targets by duration, needs ninja graph
+        """
+        if not self.graph_:
+            return []
+
+        by_output = {}
+        for target in self.targets_:
+            for output in target.name().split(' '):
+                by_output[output] = target
+
+        memo = {}
+
+        def longest(target, visiting):
+            key = target.name()
+            if key in memo:
+                return memo[key]
+            visiting.add(key)
+            best = (0, [])
+            for output in key.split(' '):
+                for dep in self._target_deps(output, by_output, set()):
+                    if dep.name() in visiting:
+                        continue
+                    candidate = longest(dep, visiting)
+                    if candidate[0] > best[0]:
+                        best = candidate
+            visiting.discard(key)
+            memo[key] = (best[0] + target.duration(), best[1] + [target])
+            return memo[key]
+
+        best = (0, [])
+        for target in self.targets_:
+            candidate = longest(target, set())
+            if candidate[0] > best[0]:
+                best = candidate
+        return best[1]
+
+    def _target_deps(self, output: str, by_output: dict, seen: set) -> list:
+        # nearest built targets among inputs, looking through source files and phony nodes
+        deps = []
+        for src in self.graph_.get(output, ()):
+            if src in seen:
+                continue
+            seen.add(src)
+            if src in by_output:
+                deps.append(by_output[src])
+            else:
+                deps.extend(self._target_deps(src, by_output, seen))
+        return deps
+
+    def report(self, count=20) -> str:
+        lines = ['Build profile: {0} commands, wall: {1:.2f}s, cpu: {2:.2f}s, average parallelism: {3:.2f}'.format(
+            len(self.targets_), self.wall_time() / 1000.0, self.total_time() / 1000.0, self.average_parallelism())]
+        lines.append('Slowest targets:')
+        for target in self.slowest(count):
+            lines.append('  {0:8.2f}s  {1}'.format(target.duration() / 1000.0, target.name()))
+
+        path = self.critical_path()
+        if path:
+            lines.append('Critical path ({0:.2f}s):'.format(sum(x.duration() for x in path) / 1000.0))
+            for target in path:
+                lines.append('  {0:8.2f}s  {1}'.format(target.duration() / 1000.0, target.name()))
+
+        lines.append('Parallelism over time:')
+        for offset, parallelism in self.parallelism_over_time():
+            lines.append('  {0:8.2f}s  {1:6.2f}  {2}'.format(offset / 1000.0, parallelism, '#' * int(round(parallelism))))
+        return '\n'.join(lines)
+
+
+def launcher_cmake_flags(log_path: str, languages=('C', 'CXX'), next_launcher=None) -> list:
+    # per-command timings for generators without .ninja_log
+    launcher_line = [sys.executable, os.path.abspath(__file__), log_path]
+    if next_launcher:
+        launcher_line.append(next_launcher)
+    launcher = ';'.join(launcher_line)
+    return ['-DCMAKE_{0}_COMPILER_LAUNCHER={1}'.format(lang, launcher) for lang in languages]
+
+
+def collect_build_profile(build_dir: str):
+    """
+    Build profile from .ninja_log (with dependency graph) or launcher log in build_dir, None if absent
+    """
+    ninja_log = os.path.join(build_dir, NINJA_LOG_FILE_NAME)
+    if os.path.exists(ninja_log):
+        graph = None
+        try:
+            dot = subprocess.check_output(['ninja', '-C', build_dir, '-t', 'graph'], stderr=subprocess.DEVNULL)
+            graph = parse_ninja_graph(dot.decode('utf-8', 'replace'))
+        except (OSError, subprocess.CalledProcessError):
+            pass
+        return BuildProfile(parse_ninja_log(ninja_log), graph)
+
+    launcher_log = os.path.join(build_dir, LAUNCHER_LOG_FILE_NAME)
+    if os.path.exists(launcher_log):
+        return BuildProfile(parse_launcher_log(launcher_log))
+    return None
+
+
+def _target_name(cmd: list) -> str:
+    if '-o' in cmd and cmd.index('-o') + 1 < len(cmd):
+        return cmd[cmd.index('-o') + 1]
+    return ' '.join(cmd)
+
+
+def launch(log_path: str, cmd: list) -> int:
+    start = int(time.time() * 1000)
+    rc = subprocess.call(cmd)
+    end = int(time.time() * 1000)
+    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, '{0}\t{1}\t{2}\n'.format(start, end, _target_name(cmd)).encode('utf-8'))
+    finally:
+        os.close(fd)
+    return rc
+
+
+if __name__ == '__main__':
+    sys.exit(launch(sys.argv[1], sys.argv[2:]))
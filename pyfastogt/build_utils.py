@@ -2,14 +2,201 @@ import os
 import stat
 import shutil
 import subprocess
-from pyfastogt import system_info, utils
+import functools
+import hashlib
+import math
+import re
+import time
+from pyfastogt import build_profile, system_info, trace, utils
+
+
+def _cgroup_cpu_quota():
+    # cgroup v2
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota, period = f.read().split()[:2]
+            if quota != 'max':
+                return int(quota) / int(period)
+            return None
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpu_count() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        count = len(os.sched_getaffinity(0))
+    else:
+        count = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota:
+        count = min(count, max(1, int(math.ceil(quota))))
+    return count
+
+
+def _make_supports_jobserver_fifo() -> bool:
+    try:
+        output = subprocess.check_output(['make', '--version'], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    res = re.search(rb'GNU Make (\d+)\.(\d+)', output)
+    if not res:
+        return False
+    return (int(res.group(1)), int(res.group(2))) >= (4, 4)
+
+
+@functools.lru_cache(maxsize=None)
+def _ninja_supports_jobserver() -> bool:
+    try:
+        output = subprocess.check_output(['ninja', '--version'], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    res = re.match(rb'(\d+)\.(\d+)', output.strip())
+    if not res:
+        return False
+    return (int(res.group(1)), int(res.group(2))) >= (1, 13)
+
+
+class JobServer(object):
+    """
+    GNU make jobserver shared by every make/ninja started from this process and its workers,
+    published through MAKEFLAGS; ninja >= 1.13 understands only the fifo style, older ninja and
+    platforms without fifos get a -j share of the slots instead
+    """
+
+    def __init__(self, jobs=None, clients=1):
+        self.jobs_ = jobs or available_cpu_count()
+        self.clients_ = max(1, clients)
+        self.fifo_dir_ = None
+        self.read_fd_ = None
+        self.write_fd_ = None
+        self.use_fifo_ = False
+        self.old_makeflags_ = None
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(os, 'mkfifo')
+
+    def jobs(self) -> int:
+        return self.jobs_
+
+    def client_jobs(self) -> int:
+        # -j of a tool that can not read the jobserver, so that concurrent clients do not oversubscribe
+        return max(1, self.jobs_ // self.clients_)
+
+    def fifo_path(self) -> str:
+        return os.path.join(self.fifo_dir_, 'fifo') if self.fifo_dir_ else None
+
+    def is_fifo(self) -> bool:
+        return self.use_fifo_
+
+    def makeflags(self) -> str:
+        if self.use_fifo_:
+            auth = 'fifo:{0}'.format(self.fifo_path())
+        else:
+            auth = '{0},{1}'.format(self.read_fd_, self.write_fd_)
+        return ' -j{0} --jobserver-auth={1}'.format(self.jobs_, auth)
+
+    def pass_fds(self) -> tuple:
+        if self.use_fifo_ or self.read_fd_ is None:
+            return ()
+        return self.read_fd_, self.write_fd_
+
+    def start(self):
+        global _JOBSERVER
+        import tempfile
+
+        self.fifo_dir_ = tempfile.mkdtemp(prefix='pyfastogt_jobserver_')
+        os.mkfifo(self.fifo_path(), 0o600)
+        self.read_fd_ = os.open(self.fifo_path(), os.O_RDONLY | os.O_NONBLOCK)
+        self.write_fd_ = os.open(self.fifo_path(), os.O_WRONLY)
+        os.set_blocking(self.read_fd_, True)
+        os.set_inheritable(self.read_fd_, True)
+        os.set_inheritable(self.write_fd_, True)
+        # every client owns one implicit slot
+        os.write(self.write_fd_, b'+' * (self.jobs_ - 1))
+        self.use_fifo_ = _make_supports_jobserver_fifo()
+
+        self.old_makeflags_ = os.environ.get('MAKEFLAGS')
+        os.environ['MAKEFLAGS'] = self.makeflags()
+        _JOBSERVER = self
+        print('Jobserver started with {0} jobs'.format(self.jobs_))
+
+    def stop(self):
+        global _JOBSERVER
+        if _JOBSERVER is self:
+            _JOBSERVER = None
+        if self.old_makeflags_ is None:
+            os.environ.pop('MAKEFLAGS', None)
+        else:
+            os.environ['MAKEFLAGS'] = self.old_makeflags_
+        for fd in [self.read_fd_, self.write_fd_]:
+            if fd is not None:
+                os.close(fd)
+        self.read_fd_ = self.write_fd_ = None
+        if self.fifo_dir_:
+            shutil.rmtree(self.fifo_dir_, ignore_errors=True)
+            self.fifo_dir_ = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+_JOBSERVER = None
+
+
+def current_jobserver() -> JobServer:
+    return _JOBSERVER
+
+
+def _attach_jobserver(jobserver: JobServer):
+    # worker processes started with spawn/forkserver do not inherit the module global
+    global _JOBSERVER
+    if jobserver and not _JOBSERVER:
+        _JOBSERVER = jobserver
+
+
+def _worker_mp_context():
+    # pipe style jobserver fds (make < 4.4) are only inherited by forked workers
+    import multiprocessing
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def _jobserver_call_kwargs() -> dict:
+    if not _JOBSERVER:
+        return {}
+    return {'pass_fds': _JOBSERVER.pass_fds()}
+
+
+def _ninja_jobserver_client(jobserver: JobServer) -> bool:
+    return jobserver.is_fifo() and _ninja_supports_jobserver()
 
 
 class BuildSystem:
-    def __init__(self, name: str, cmd_line: list, cmake_generator_arg: str):
+    def __init__(self, name: str, cmd_line: list, cmake_generator_arg: str, jobserver_client=None):
         self.name_ = name
         self.cmd_line_ = cmd_line
         self.cmake_generator_arg_ = cmake_generator_arg
+        self.jobserver_client_ = jobserver_client  # (jobserver) -> bool, None: understands any style
 
     def cmake_generator_arg(self) -> str:
         return self.cmake_generator_arg_
@@ -18,12 +205,18 @@ class BuildSystem:
         return self.name_
 
     def cmd_line(self) -> list:  # cmd + args
-        return self.cmd_line_
+        line = list(self.cmd_line_)
+        jobserver = current_jobserver()
+        if jobserver and (not self.jobserver_client_ or self.jobserver_client_(jobserver)):
+            return line  # job slots come from MAKEFLAGS
 
+        line.append('-j{0}'.format(jobserver.client_jobs() if jobserver else available_cpu_count()))
+        return line
 
-SUPPORTED_BUILD_SYSTEMS = [BuildSystem('ninja', ['ninja'], 'Ninja'),
-                           BuildSystem('make', ['make', '-j2'], 'Unix Makefiles'),
-                           BuildSystem('gmake', ['gmake', '-j2'], 'Unix Makefiles')]
+
+SUPPORTED_BUILD_SYSTEMS = [BuildSystem('ninja', ['ninja'], 'Ninja', _ninja_jobserver_client),
+                           BuildSystem('make', ['make'], 'Unix Makefiles'),
+                           BuildSystem('gmake', ['gmake'], 'Unix Makefiles')]
 
 
 def get_supported_build_system_by_name(name) -> BuildSystem:
@@ -38,9 +231,104 @@ class BuildError(Exception):
         return self.value_
 
 
+class CompilerCache(object):
+    CMAKE_LANGUAGES = ['C', 'CXX']
+
+    def __init__(self, name: str, path: str):
+        self.name_ = name
+        self.path_ = path
+
+    def name(self) -> str:
+        return self.name_
+
+    def path(self) -> str:
+        return self.path_
+
+    def cmake_flags(self) -> list:
+        return ['-DCMAKE_{0}_COMPILER_LAUNCHER={1}'.format(lang, self.path_) for lang in CompilerCache.CMAKE_LANGUAGES]
+
+    def wrap_env(self, env: dict) -> dict:
+        # CC/CXX may already be overridden by platform env_variables (android)
+        wrapped = dict(env)
+        for key, default in [('CC', 'cc'), ('CXX', 'c++')]:
+            compiler = env.get(key, default)
+            if os.path.basename(compiler.split(' ', 1)[0]) in ['ccache', 'sccache']:
+                continue
+            wrapped[key] = '{0} {1}'.format(self.path_, compiler)
+        return wrapped
+
+    def stats(self) -> dict:
+        """
+        Cumulative {'hits': int, 'misses': int}, empty dict if unavailable
+        """
+        import json
+
+        try:
+            if self.name_ == 'sccache':
+                output = subprocess.check_output([self.path_, '--show-stats', '--stats-format=json'],
+                                                 stderr=subprocess.DEVNULL)
+                stats = json.loads(output.decode('utf-8'))['stats']
+                return {'hits': sum(stats['cache_hits']['counts'].values()),
+                        'misses': sum(stats['cache_misses']['counts'].values())}
+
+            output = subprocess.check_output([self.path_, '--print-stats'], stderr=subprocess.DEVNULL)
+            values = {}
+            for line in output.decode('utf-8').splitlines():
+                fields = line.split('\t')
+                if len(fields) == 2 and fields[1].isdigit():
+                    values[fields[0]] = int(fields[1])
+            return {'hits': values.get('direct_cache_hit', 0) + values.get('preprocessed_cache_hit', 0),
+                    'misses': values.get('cache_miss', 0)}
+        except (OSError, ValueError, KeyError, subprocess.CalledProcessError):
+            return {}
+
+
+SUPPORTED_COMPILER_CACHES = ['sccache', 'ccache']
+
+
+def detect_compiler_cache(name=None) -> CompilerCache:
+    names = [name] if name else SUPPORTED_COMPILER_CACHES
+    for cache_name in names:
+        path = shutil.which(cache_name) if hasattr(shutil, 'which') else None
+        if path:
+            return CompilerCache(cache_name, path)
+    return None
+
+
+def _resolve_compiler_cache(compiler_cache) -> CompilerCache:
+    # True - autodetect, None/False - disabled
+    if compiler_cache is True:
+        return detect_compiler_cache()
+    return compiler_cache or None
+
+
+TOOLCHAIN_ENV_VARIABLES = ['CC', 'CXX', 'CFLAGS', 'CXXFLAGS', 'CPPFLAGS', 'LDFLAGS', 'AR', 'RANLIB', 'PATH']
+BUILD_CONFIG_FILE_NAME = '.pyfastogt_build_config'
+
+
+def build_config_fingerprint(cmake_line: list) -> str:
+    lines = list(cmake_line)
+    for key in TOOLCHAIN_ENV_VARIABLES:
+        lines.append('{0}={1}'.format(key, os.environ.get(key, '')))
+    for tool in ['cmake', os.environ.get('CC', 'cc'), os.environ.get('CXX', 'c++')]:
+        path = shutil.which(tool) if hasattr(shutil, 'which') else None
+        if path:
+            lines.append('{0}:{1}'.format(path, os.stat(path).st_mtime))
+    return '\n'.join(lines)
+
+
+def _is_build_dir_reusable(build_dir_name: str, fingerprint: str) -> bool:
+    config_path = os.path.join(build_dir_name, BUILD_CONFIG_FILE_NAME)
+    if not os.path.exists(config_path):
+        return False
+    with open(config_path, 'r') as f:
+        return f.read() == fingerprint
+
+
 # must be in cmake folder
 def build_command_cmake(prefix_path: str, cmake_flags: list, build_type='RELEASE',
-                        build_system=get_supported_build_system_by_name('ninja')):
+                        build_system=get_supported_build_system_by_name('ninja'), destdir=None,
+                        incremental=False, profile=False, compiler_cache=True):
     cmake_project_root_abs_path = '..'
     if not os.path.exists(cmake_project_root_abs_path):
         raise BuildError('invalid cmake_project_root_path: %s' % cmake_project_root_abs_path)
@@ -52,40 +340,238 @@ def build_command_cmake(prefix_path: str, cmake_flags: list, build_type='RELEASE
     cmake_line.extend(['-DCMAKE_INSTALL_PREFIX=%s' % abs_prefix_path])
     try:
         build_dir_name = 'build_cmake_%s' % build_type.lower()
+        launcher_log = os.path.abspath(os.path.join(build_dir_name, build_profile.LAUNCHER_LOG_FILE_NAME))
+        compiler_cache = _resolve_compiler_cache(compiler_cache)
+        if profile and build_system.name() != 'ninja':
+            cmake_line.extend(build_profile.launcher_cmake_flags(
+                launcher_log, CompilerCache.CMAKE_LANGUAGES, compiler_cache.path() if compiler_cache else None))
+        elif compiler_cache:
+            cmake_line.extend(compiler_cache.cmake_flags())
+        fingerprint = build_config_fingerprint(cmake_line)
         if os.path.exists(build_dir_name):
-            shutil.rmtree(build_dir_name)
+            if incremental and _is_build_dir_reusable(build_dir_name, fingerprint):
+                print('Reusing build directory: {0}'.format(os.path.abspath(build_dir_name)))
+            else:
+                shutil.rmtree(build_dir_name)
 
-        os.mkdir(build_dir_name)
+        os.makedirs(build_dir_name, exist_ok=True)
         os.chdir(build_dir_name)
-        subprocess.call(cmake_line)
+        trace.call(cmake_line, 'configure', **_jobserver_call_kwargs())
+        with open(BUILD_CONFIG_FILE_NAME, 'w') as f:
+            f.write(fingerprint)
+        if os.path.exists(launcher_log):
+            os.remove(launcher_log)
         make_line = build_system.cmd_line()
-        subprocess.call(make_line)
-        make_line.append('install')
-        subprocess.call(make_line)
-        if hasattr(shutil, 'which') and shutil.which('ldconfig'):
-            subprocess.call(['ldconfig'])
+        trace.call(make_line, 'compile', **_jobserver_call_kwargs())
+        if profile:
+            _report_build_profile(os.getcwd())
+        install_line = make_line + ['install']
+        trace.call(install_line, 'install', env=_install_env(destdir), **_jobserver_call_kwargs())
+        if not destdir and hasattr(shutil, 'which') and shutil.which('ldconfig'):
+            trace.call(['ldconfig'], 'ldconfig')
     except Exception as ex:
         ex_str = str(ex)
         raise BuildError(ex_str)
 
 
+def _report_build_profile(build_dir: str):
+    profile = build_profile.collect_build_profile(build_dir)
+    if not profile:
+        print('No build profile data in: {0}'.format(build_dir))
+        return
+
+    report = profile.report()
+    print(report)
+    with open(os.path.join(build_dir, build_profile.PROFILE_REPORT_FILE_NAME), 'w') as f:
+        f.write(report)
+
+
 # must be in configure folder
 def build_command_configure(compiler_flags: list, prefix_path, executable='./configure',
-                            build_system=get_supported_build_system_by_name('make')):
+                            build_system=get_supported_build_system_by_name('make'), destdir=None,
+                            compiler_cache=True):
     # +x for exec file
     st = os.stat(executable)
     os.chmod(executable, st.st_mode | stat.S_IEXEC)
 
+    compiler_cache = _resolve_compiler_cache(compiler_cache)
+    env = compiler_cache.wrap_env(os.environ) if compiler_cache else None
+
     abs_prefix_path = os.path.expanduser(prefix_path)
     compile_cmd = [executable, '--prefix={0}'.format(abs_prefix_path)]
     compile_cmd.extend(compiler_flags)
-    subprocess.call(compile_cmd)
+    trace.call(compile_cmd, 'configure', env=env, **_jobserver_call_kwargs())
     make_line = build_system.cmd_line()
-    subprocess.call(make_line)
-    make_line.append('install')
-    subprocess.call(make_line)
-    if hasattr(shutil, 'which') and shutil.which('ldconfig'):
-        subprocess.call(['ldconfig'])
+    trace.call(make_line, 'compile', env=env, **_jobserver_call_kwargs())
+    install_line = make_line + ['install']
+    trace.call(install_line, 'install', env=_install_env(destdir, env), **_jobserver_call_kwargs())
+    if not destdir and hasattr(shutil, 'which') and shutil.which('ldconfig'):
+        trace.call(['ldconfig'], 'ldconfig')
+
+
+def _install_env(destdir, env=None):
+    # make, ninja(cmake) and autotools install rules all honor DESTDIR
+    if not destdir:
+        return env
+    env = dict(env or os.environ)
+    env['DESTDIR'] = destdir
+    return env
+
+
+def destdir_prefix_path(destdir: str, prefix_path: str) -> str:
+    drive, tail = os.path.splitdrive(os.path.abspath(prefix_path))
+    return os.path.join(destdir, tail.lstrip('/\\'))
+
+
+def merge_tree(src: str, dst: str):
+    """
+    Copy files and symlinks of src into existing dst tree; only missing directories are created,
+    mode/mtime of existing ones (e.g. /, /usr) are never touched
+    """
+    for root, dirs, files in os.walk(src):
+        target_root = os.path.join(dst, os.path.relpath(root, src))
+        for name in list(dirs):
+            src_path = os.path.join(root, name)
+            dst_path = os.path.join(target_root, name)
+            if os.path.islink(src_path):  # symlinks to directories are not descended
+                dirs.remove(name)
+                files.append(name)
+            elif not os.path.isdir(dst_path):
+                os.mkdir(dst_path)
+                shutil.copymode(src_path, dst_path)
+        for name in files:
+            src_path = os.path.join(root, name)
+            dst_path = os.path.join(target_root, name)
+            if os.path.islink(dst_path) or (os.path.lexists(dst_path) and os.path.islink(src_path)):
+                os.remove(dst_path)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+            else:
+                shutil.copy2(src_path, dst_path)
+
+
+def destdir_root(prefix_path: str) -> str:
+    # directory a DESTDIR tree is merged into, files may be installed outside of prefix
+    drive, _ = os.path.splitdrive(os.path.abspath(prefix_path))
+    return drive + os.sep
+
+
+def source_tree_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(x for x in dirs if x != '.git' and not x.startswith('build_cmake_'))
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            sha.update(os.path.relpath(file_path, path).encode('utf-8'))
+            sha.update(b'\0')
+            if os.path.islink(file_path):
+                sha.update(os.readlink(file_path).encode('utf-8'))
+                continue
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for file_name in files:
+            size += os.lstat(os.path.join(root, file_name)).st_size
+    return size
+
+
+class InstallCache(object):
+    DEFAULT_CACHE_DIR = '~/.cache/pyfastogt/install'
+    DEFAULT_MAX_SIZE = 10 * 1024 * 1024 * 1024
+    TREE_DIR_NAME = 'tree'
+    SIZE_FILE_NAME = 'size'
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir_ = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_size_ = max_size
+        os.makedirs(self.cache_dir_, exist_ok=True)
+
+    def cache_dir(self) -> str:
+        return self.cache_dir_
+
+    def max_size(self) -> int:
+        return self.max_size_
+
+    @staticmethod
+    def make_key(source_digest: str, flags: list, platform_name: str, arch_name: str, build_type: str,
+                 prefix_path: str) -> str:
+        # prefix is baked into installed .pc/cmake config files, so it is part of the key
+        sha = hashlib.sha256()
+        parts = [source_digest, platform_name, arch_name, build_type, os.path.abspath(prefix_path)]
+        for part in parts + list(flags):
+            sha.update(str(part).encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir_, key)
+
+    def contains(self, key: str) -> bool:
+        return os.path.isdir(os.path.join(self._entry_path(key), InstallCache.TREE_DIR_NAME))
+
+    def restore(self, key: str, root: str) -> bool:
+        """
+        Merge cached DESTDIR tree of key into root
+        """
+        if not self.contains(key):
+            return False
+
+        entry = self._entry_path(key)
+        merge_tree(os.path.join(entry, InstallCache.TREE_DIR_NAME), root)
+        os.utime(entry)  # lru mark
+        return True
+
+    def store(self, key: str, installed_tree: str):
+        entry = self._entry_path(key)
+        if self.contains(key):
+            os.utime(entry)
+            return
+
+        tmp_entry = entry + '.tmp.%d' % os.getpid()
+        if os.path.exists(tmp_entry):
+            shutil.rmtree(tmp_entry)
+        shutil.copytree(installed_tree, os.path.join(tmp_entry, InstallCache.TREE_DIR_NAME), symlinks=True)
+        with open(os.path.join(tmp_entry, InstallCache.SIZE_FILE_NAME), 'w') as f:
+            f.write(str(_tree_size(installed_tree)))
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:  # stored concurrently by another build
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+
+    def _entry_size(self, entry: str) -> int:
+        try:
+            with open(os.path.join(entry, InstallCache.SIZE_FILE_NAME), 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def size(self) -> int:
+        return sum(self._entry_size(entry) for entry, _ in self._entries())
+
+    def _entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.cache_dir_):
+            entry = os.path.join(self.cache_dir_, name)
+            if '.tmp.' in name or not os.path.isdir(entry):
+                continue
+            entries.append((entry, os.stat(entry).st_mtime))
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda x: x[1])
+        total = sum(self._entry_size(entry) for entry, _ in entries)
+        for entry, _ in entries:
+            if total <= self.max_size_:
+                break
+            total -= self._entry_size(entry)
+            shutil.rmtree(entry, ignore_errors=True)
 
 
 def generate_fastogt_git_path(repo_name) -> str:
@@ -97,7 +583,9 @@ class BuildRequest(object):
     ARCH_OPENSSL_COMP = "gz"
     ARCH_OPENSSL_EXT = "tar." + ARCH_OPENSSL_COMP
 
-    def __init__(self, platform: str, arch_name: str, dir_path: str, prefix_path: str):
+    def __init__(self, platform: str, arch_name: str, dir_path: str, prefix_path: str, install_cache=None,
+                 incremental=False, download_cache_dir=None, stream_downloads=False, git_mirror_dir=None,
+                 profile=False, compiler_cache=True):
         platform_or_none = system_info.get_supported_platform_by_name(platform)
         if not platform_or_none:
             raise BuildError('invalid platform')
@@ -120,14 +608,22 @@ class BuildRequest(object):
 
         self.platform_ = build_platform
         build_dir_path = os.path.abspath(dir_path)
-        if os.path.exists(build_dir_path):
+        if os.path.exists(build_dir_path) and not incremental:
             shutil.rmtree(build_dir_path)
 
-        os.mkdir(build_dir_path)
+        os.makedirs(build_dir_path, exist_ok=True)
         os.chdir(build_dir_path)
 
         self.build_dir_path_ = build_dir_path
         self.prefix_path_ = abs_prefix_path
+        self.install_cache_ = install_cache
+        self.incremental_ = incremental
+        self.download_cache_dir_ = download_cache_dir
+        self.stream_downloads_ = stream_downloads
+        self.git_mirror_dir_ = git_mirror_dir
+        self.profile_ = profile
+        self.compiler_cache_ = _resolve_compiler_cache(compiler_cache)
+        self.compiler_cache_stats_ = self.compiler_cache_.stats() if self.compiler_cache_ else {}
         print("Build request for platform: {0}({1}) created".format(build_platform.name(), arch_or_none.name()))
 
     def platform(self):
@@ -142,6 +638,36 @@ class BuildRequest(object):
     def prefix_path(self):
         return self.prefix_path_
 
+    def install_cache(self):
+        return self.install_cache_
+
+    def incremental(self) -> bool:
+        return self.incremental_
+
+    def download_cache_dir(self):
+        return self.download_cache_dir_
+
+    def stream_downloads(self) -> bool:
+        return self.stream_downloads_
+
+    def git_mirror_dir(self):
+        return self.git_mirror_dir_
+
+    def profile(self) -> bool:
+        return self.profile_
+
+    def compiler_cache(self) -> CompilerCache:
+        return self.compiler_cache_
+
+    def compiler_cache_stats(self) -> dict:
+        """
+        Compiler cache hits/misses since this request was created
+        """
+        if not self.compiler_cache_:
+            return {}
+        stats = self.compiler_cache_.stats()
+        return {key: value - self.compiler_cache_stats_.get(key, 0) for key, value in stats.items()}
+
     def build_snappy(self):
         self._clone_and_build_via_cmake(generate_fastogt_git_path('snappy'),
                                         ['-DBUILD_SHARED_LIBS=OFF', '-DSNAPPY_BUILD_TESTS=OFF'])
@@ -157,7 +683,7 @@ class BuildRequest(object):
         cpuid_compiler_flags = ['--disable-shared', '--enable-static']
 
         pwd = os.getcwd()
-        cloned_dir = utils.git_clone(generate_fastogt_git_path('libcpuid'))
+        cloned_dir = self._git_clone(generate_fastogt_git_path('libcpuid'))
         os.chdir(cloned_dir)
 
         platform_name = self.platform_name()
@@ -165,10 +691,10 @@ class BuildRequest(object):
             libtoolize_cpuid = ['glibtoolize']
         else:
             libtoolize_cpuid = ['libtoolize']
-        subprocess.call(libtoolize_cpuid)
+        trace.call(libtoolize_cpuid, 'libtoolize')
 
         autoreconf_cpuid = ['autoreconf', '--install']
-        subprocess.call(autoreconf_cpuid)
+        trace.call(autoreconf_cpuid, 'autoreconf')
 
         self._build_via_configure(cpuid_compiler_flags)
 
@@ -181,67 +707,87 @@ class BuildRequest(object):
 
         self._clone_and_build_via_cmake(generate_fastogt_git_path('common'), cmake_flags)
 
-    def build_openssl(self, version):
+    def build_openssl(self, version, sha256=None):
         compiler_flags = ['no-shared', 'no-unit-test']
         platform = self.platform()
         if platform.name() == 'android':
             compiler_flags.extend(['no-asm'])
 
         url = '{0}openssl-{1}.{2}'.format(self.OPENSSL_SRC_ROOT, version, self.ARCH_OPENSSL_EXT)
-        self._download_and_build_via_configure(url, compiler_flags, './config', False)
+        self._download_and_build_via_configure(url, compiler_flags, './config', False, sha256)
+
+    def build_steps(self, steps: list, max_workers=None):
+        return BuildScheduler(self, steps, max_workers).run()
 
     # install packages
     def _install_package(self, name: str):
         self.platform_.install_package(name)
 
     # clone
+    def _git_clone(self, url: str, branch=None, remove_dot_git=True) -> str:
+        if self.incremental_:
+            cloned_dir = os.path.join(os.getcwd(), utils.git_cloned_dir_name(url))
+            if os.path.isdir(cloned_dir):
+                print('Reusing source checkout: {0}'.format(cloned_dir))
+                return cloned_dir
+        return utils.git_clone(url, branch, remove_dot_git, self.git_mirror_dir_)
+
+    @trace.traced('build')
     def _clone_and_build_via_cmake(self, url: str, cmake_flags: list, branch=None, remove_dot_git=True):
         pwd = os.getcwd()
-        cloned_dir = utils.git_clone(url, branch, remove_dot_git)
+        cloned_dir = self._git_clone(url, branch, remove_dot_git)
         os.chdir(cloned_dir)
         self._build_via_cmake(cmake_flags)
         os.chdir(pwd)
 
+    @trace.traced('build')
     def _clone_and_build_via_configure(self, url: str, compiler_flags: list, executable='./configure',
                                        use_platform_flags=True, branch=None, remove_dot_git=True):
         pwd = os.getcwd()
-        cloned_dir = utils.git_clone(url, branch, remove_dot_git)
+        cloned_dir = self._git_clone(url, branch, remove_dot_git)
         os.chdir(cloned_dir)
         self._build_via_configure(compiler_flags, executable, use_platform_flags)
         os.chdir(pwd)
 
+    @trace.traced('build')
     def _clone_and_build_via_autogen(self, url: str, compiler_flags: list, executable='./configure',
                                      use_platform_flags=True, branch=None,
                                      remove_dot_git=True):
         pwd = os.getcwd()
-        cloned_dir = utils.git_clone(url, branch, remove_dot_git)
+        cloned_dir = self._git_clone(url, branch, remove_dot_git)
         os.chdir(cloned_dir)
         self._build_via_autogen(compiler_flags, executable, use_platform_flags)
         os.chdir(pwd)
 
     # download
-    def _download_and_build_via_cmake(self, url: str, cmake_flags: list):
+    def _download_and_extract(self, url: str, expected_sha256=None) -> str:
+        if self.stream_downloads_:
+            return utils.download_and_extract_file(url, expected_sha256, self.download_cache_dir_)
+        file_path = utils.download_file(url, expected_sha256, self.download_cache_dir_)
+        return utils.extract_file(file_path)
+
+    @trace.traced('build')
+    def _download_and_build_via_cmake(self, url: str, cmake_flags: list, expected_sha256=None):
         pwd = os.getcwd()
-        file_path = utils.download_file(url)
-        extracted_folder = utils.extract_file(file_path)
+        extracted_folder = self._download_and_extract(url, expected_sha256)
         os.chdir(extracted_folder)
         self._build_via_cmake(cmake_flags)
         os.chdir(pwd)
 
+    @trace.traced('build')
     def _download_and_build_via_autogen(self, url: str, compiler_flags: list, executable='./configure',
-                                        use_platform_flags=True):
+                                        use_platform_flags=True, expected_sha256=None):
         pwd = os.getcwd()
-        file_path = utils.download_file(url)
-        extracted_folder = utils.extract_file(file_path)
+        extracted_folder = self._download_and_extract(url, expected_sha256)
         os.chdir(extracted_folder)
         self._build_via_autogen(compiler_flags, executable, use_platform_flags)
         os.chdir(pwd)
 
+    @trace.traced('build')
     def _download_and_build_via_configure(self, url: str, compiler_flags: list, executable='./configure',
-                                          use_platform_flags=True):
+                                          use_platform_flags=True, expected_sha256=None):
         pwd = os.getcwd()
-        file_path = utils.download_file(url)
-        extracted_folder = utils.extract_file(file_path)
+        extracted_folder = self._download_and_extract(url, expected_sha256)
         os.chdir(extracted_folder)
         self._build_via_configure(compiler_flags, executable, use_platform_flags)
         os.chdir(pwd)
@@ -249,18 +795,218 @@ class BuildRequest(object):
     # build
     def _build_via_autogen(self, compiler_flags: list, executable='./configure', use_platform_flags=True):
         autogen_line = ['sh', 'autogen.sh']
-        subprocess.call(autogen_line)
+        trace.call(autogen_line, 'autogen')
         self._build_via_configure(compiler_flags, executable, use_platform_flags)
 
     # raw build
-    def _build_via_cmake(self, cmake_flags: list, use_platform_flags=True):
+    def _build_via_cmake(self, cmake_flags: list, use_platform_flags=True, build_type='RELEASE'):
         cmake_flags_extended = cmake_flags
         if use_platform_flags:
             cmake_flags_extended.extend(self.platform_.cmake_specific_flags())
-        build_command_cmake(self.prefix_path_, cmake_flags)
+        self._build_cached(cmake_flags_extended + ['cmake'], build_type,
+                           lambda destdir: build_command_cmake(self.prefix_path_, cmake_flags_extended, build_type,
+                                                               destdir=destdir, incremental=self.incremental_,
+                                                               profile=self.profile_,
+                                                               compiler_cache=self.compiler_cache_))
 
     def _build_via_configure(self, compiler_flags: list, executable='./configure', use_platform_flags=True):
         compiler_flags_extended = compiler_flags
         if use_platform_flags:
             compiler_flags_extended.extend(self.platform_.configure_specific_flags())
-        build_command_configure(compiler_flags_extended, self.prefix_path_, executable)
+        self._build_cached(compiler_flags_extended + [executable], '',
+                           lambda destdir: build_command_configure(compiler_flags_extended, self.prefix_path_,
+                                                                   executable, destdir=destdir,
+                                                                   compiler_cache=self.compiler_cache_))
+
+    def _print_compiler_cache_stats(self):
+        stats = self.compiler_cache_stats()
+        if stats:
+            print('{0}: {1} hits, {2} misses'.format(self.compiler_cache_.name(), stats['hits'], stats['misses']))
+
+    def _build_cached(self, flags: list, build_type: str, build):
+        if not self.install_cache_:
+            build(None)
+            self._print_compiler_cache_stats()
+            return
+
+        source_dir = os.getcwd()
+        key = InstallCache.make_key(source_tree_digest(source_dir), flags, self.platform_.name(),
+                                    self.platform_.architecture().name(), build_type, self.prefix_path_)
+        root = destdir_root(self.prefix_path_)
+        with trace.span('install cache restore', args={'key': key}):
+            restored = self.install_cache_.restore(key, root)
+        if restored:
+            print('Restored {0} from install cache'.format(source_dir))
+        else:
+            destdir = os.path.join(self.build_dir_path_, '.destdir_' + key)
+            if os.path.exists(destdir):
+                shutil.rmtree(destdir)
+            build(destdir)
+            self._print_compiler_cache_stats()
+            os.chdir(source_dir)
+            if not os.path.isdir(destdir) or not os.listdir(destdir):
+                raise BuildError('nothing installed into: {0}'.format(destdir))
+            # whole DESTDIR tree, packages may install files outside of prefix
+            self.install_cache_.store(key, destdir)
+            merge_tree(destdir, root)
+            shutil.rmtree(destdir)
+
+        if hasattr(shutil, 'which') and shutil.which('ldconfig'):
+            trace.call(['ldconfig'], 'ldconfig')
+
+
+class BuildStep(object):
+    def __init__(self, name: str, method: str, args=(), depends_on=()):
+        self.name_ = name
+        self.method_ = method
+        self.args_ = tuple(args)
+        self.depends_on_ = list(depends_on)
+
+    def name(self) -> str:
+        return self.name_
+
+    def method(self) -> str:  # name of BuildRequest method
+        return self.method_
+
+    def args(self) -> tuple:
+        return self.args_
+
+    def depends_on(self) -> list:
+        return self.depends_on_
+
+
+def default_build_steps(openssl_version=None, with_qt=False) -> list:
+    steps = [BuildStep('snappy', 'build_snappy'),
+             BuildStep('jsonc', 'build_jsonc'),
+             BuildStep('libev', 'build_libev'),
+             BuildStep('cpuid', 'build_cpuid'),
+             BuildStep('common', 'build_common', [with_qt], ['snappy', 'jsonc', 'libev'])]
+    if openssl_version:
+        steps.append(BuildStep('openssl', 'build_openssl', [openssl_version]))
+    return steps
+
+
+class BuildReport(object):
+    def __init__(self, durations: dict, wall_time: float):
+        self.durations_ = durations
+        self.wall_time_ = wall_time
+
+    def durations(self) -> dict:  # step name -> seconds
+        return self.durations_
+
+    def wall_time(self) -> float:
+        return self.wall_time_
+
+    def serial_time(self) -> float:
+        return sum(self.durations_.values())
+
+    def speedup(self) -> float:
+        if not self.wall_time_:
+            return 1.0
+        return self.serial_time() / self.wall_time_
+
+    def __str__(self):
+        lines = ['{0}: {1:.2f}s'.format(name, duration) for name, duration in self.durations_.items()]
+        lines.append('wall-clock: {0:.2f}s, serial: {1:.2f}s, speedup: {2:.2f}x'.format(
+            self.wall_time_, self.serial_time(), self.speedup()))
+        return '\n'.join(lines)
+
+
+def _run_build_step(request, method: str, args: tuple, jobserver=None, tracer=None) -> float:
+    # runs in a worker process, so chdir does not affect other builds
+    _attach_jobserver(jobserver)
+    if tracer:
+        trace.attach_tracing(*tracer)
+    start = time.monotonic()
+    os.chdir(request.build_dir_path())
+    try:
+        with trace.span(method, 'step'):
+            getattr(request, method)(*args)
+    finally:
+        trace.flush()
+    return time.monotonic() - start
+
+
+class BuildScheduler(object):
+    def __init__(self, request, steps: list, max_workers=None):
+        self.request_ = request
+        self.steps_ = {}
+        for step in steps:
+            if step.name() in self.steps_:
+                raise BuildError('duplicate build step: {0}'.format(step.name()))
+            self.steps_[step.name()] = step
+
+        for step in steps:
+            for dep in step.depends_on():
+                if dep not in self.steps_:
+                    raise BuildError('step {0} depends on unknown step: {1}'.format(step.name(), dep))
+
+        self.order_ = self._topological_order()
+        self.max_workers_ = max_workers or os.cpu_count() or 1
+
+    def order(self) -> list:
+        return self.order_
+
+    def _topological_order(self) -> list:
+        order = []
+        pending = {name: set(step.depends_on()) for name, step in self.steps_.items()}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise BuildError('cyclic build steps: {0}'.format(', '.join(sorted(pending))))
+            for name in ready:
+                order.append(name)
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(self) -> BuildReport:
+        durations = {}
+        start = time.monotonic()
+        jobserver = None
+        if not current_jobserver() and JobServer.is_supported():
+            jobserver = JobServer(clients=min(self.max_workers_, len(self.steps_)))
+            jobserver.start()
+        try:
+            self._run_steps(durations)
+        finally:
+            if jobserver:
+                jobserver.stop()
+
+        report = BuildReport(durations, time.monotonic() - start)
+        print(report)
+        return report
+
+    def _run_steps(self, durations: dict):
+        # multiprocessing and the executor cost ~50ms of import time, only schedulers need them
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+        done = set()
+        started = set()
+        running = {}
+        tracer = trace.current_tracer()
+        tracer = (tracer.path(), tracer.owner_pid()) if tracer else None  # (path, owner pid) for workers
+        with ProcessPoolExecutor(max_workers=self.max_workers_, mp_context=_worker_mp_context()) as executor:
+            while len(done) != len(self.steps_):
+                for name in self.order_:
+                    step = self.steps_[name]
+                    if name in started or not done.issuperset(step.depends_on()):
+                        continue
+                    print('Build step {0} started'.format(name))
+                    future = executor.submit(_run_build_step, self.request_, step.method(), step.args(),
+                                             current_jobserver(), tracer)
+                    running[future] = name
+                    started.add(name)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        durations[name] = future.result()
+                    except Exception as ex:
+                        for other in running:
+                            other.cancel()
+                        raise BuildError('build step {0} failed: {1}'.format(name, str(ex)))
+                    print('Build step {0} finished in {1:.2f}s'.format(name, durations[name]))
+                    done.add(name)
@@ -0,0 +1,389 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, quote
+
+from pyfastogt import utils
+
+DISPOSABLE_CHECK_URL = 'https://open.kickbox.com/v1/disposable/'
+
+
+def validate_email(email: str, check_mx=False):
+    # validate_email pulls in its DNS stack, import it on first check
+    from validate_email import validate_email as _validate_email
+    return _validate_email(email, check_mx=check_mx)
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by worker threads, rate requests per second
+    """
+
+    def __init__(self, rate: float, burst=1):
+        self.rate_ = rate
+        self.burst_ = burst
+        self.tokens_ = float(burst)
+        self.updated_ = time.monotonic()
+        self.lock_ = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock_:
+                now = time.monotonic()
+                self.tokens_ = min(self.burst_, self.tokens_ + (now - self.updated_) * self.rate_)
+                self.updated_ = now
+                if self.tokens_ >= 1.0:
+                    self.tokens_ -= 1.0
+                    return
+                wait = (1.0 - self.tokens_) / self.rate_
+            time.sleep(wait)
+
+
+class DomainVerdictCache(object):
+    """
+    Bounded LRU cache of per-domain verdicts with TTL, negative verdicts expire sooner;
+    optionally persisted to json file for warm restarts, saved at most every save_interval seconds on put
+    """
+
+    def __init__(self, max_size=100000, ttl=24 * 3600, negative_ttl=600, persist_path=None, save_interval=300):
+        self.max_size_ = max_size
+        self.ttl_ = ttl
+        self.negative_ttl_ = negative_ttl
+        self.persist_path_ = os.path.expanduser(persist_path) if persist_path else None
+        self.save_interval_ = save_interval
+        self.saved_at_ = time.monotonic()
+        self.entries_ = OrderedDict()  # key -> (value, expires_at)
+        self.lock_ = threading.Lock()
+        self.hits_ = 0
+        self.misses_ = 0
+        if self.persist_path_ and os.path.exists(self.persist_path_):
+            self.load()
+
+    def hits(self) -> int:
+        return self.hits_
+
+    def misses(self) -> int:
+        return self.misses_
+
+    def __len__(self):
+        return len(self.entries_)
+
+    def get(self, key: str):
+        """
+        Cached value or None if absent/expired
+        """
+        with self.lock_:
+            entry = self.entries_.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self.entries_[key]
+                self.misses_ += 1
+                return None
+            self.entries_.move_to_end(key)
+            self.hits_ += 1
+            return entry[0]
+
+    def put(self, key: str, value, negative=False):
+        ttl = self.negative_ttl_ if negative else self.ttl_
+        with self.lock_:
+            self.entries_[key] = (value, time.time() + ttl)
+            self.entries_.move_to_end(key)
+            while len(self.entries_) > self.max_size_:
+                self.entries_.popitem(last=False)
+            save = self.persist_path_ and self.save_interval_ is not None and \
+                time.monotonic() - self.saved_at_ >= self.save_interval_
+            if save:
+                self.saved_at_ = time.monotonic()
+        if save:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.persist_path_, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        with self.lock_:
+            for key, (value, expires_at) in sorted(data.items(), key=lambda x: x[1][1]):
+                if expires_at > now:
+                    self.entries_[key] = (value, expires_at)
+            while len(self.entries_) > self.max_size_:
+                self.entries_.popitem(last=False)
+
+    def save(self):
+        if not self.persist_path_:
+            return
+
+        with self.lock_:
+            data = {key: list(entry) for key, entry in self.entries_.items()}
+            self.saved_at_ = time.monotonic()
+        tmp_path = '{0}.tmp.{1}.{2}'.format(self.persist_path_, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.persist_path_)
+
+
+class DisposableDomainIndex(object):
+    """
+    Offline disposable-domain lookup loaded from a file with one domain per line ('#' comments allowed),
+    subdomains of listed domains match too; reload() swaps the whole set atomically
+    """
+
+    def __init__(self, path: str, check_interval=None):
+        self.path_ = os.path.expanduser(path)
+        self.check_interval_ = check_interval
+        self.domains_ = frozenset()
+        self.mtime_ = None
+        self.checked_at_ = time.monotonic()
+        self.reload()
+
+    def path(self) -> str:
+        return self.path_
+
+    def __len__(self):
+        return len(self.domains_)
+
+    @staticmethod
+    def _normalize(line: str) -> str:
+        line = line.split('#', 1)[0].strip().lower()
+        if line.startswith('*.'):
+            line = line[2:]
+        return line.strip('.')
+
+    def reload(self):
+        mtime = os.stat(self.path_).st_mtime
+        domains = frozenset(x for x in map(DisposableDomainIndex._normalize, utils.iter_file_lines(self.path_)) if x)
+        self.domains_, self.mtime_ = domains, mtime
+
+    def reload_if_changed(self) -> bool:
+        self.checked_at_ = time.monotonic()
+        try:
+            mtime = os.stat(self.path_).st_mtime
+        except OSError:
+            return False  # keep serving the last loaded list
+        if mtime == self.mtime_:
+            return False
+        self.reload()
+        return True
+
+    def is_disposable(self, domain: str) -> bool:
+        if self.check_interval_ is not None and time.monotonic() - self.checked_at_ >= self.check_interval_:
+            self.reload_if_changed()
+
+        domains = self.domains_
+        domain = domain.lower().strip('.')
+        while domain:
+            if domain in domains:
+                return True
+            dot = domain.find('.')
+            if dot == -1:
+                return False
+            domain = domain[dot + 1:]
+        return False
+
+    def __contains__(self, domain: str):
+        return self.is_disposable(domain)
+
+
+def email_domain(email: str) -> str:
+    return email.rsplit('@', 1)[-1].lower()
+
+
+class EmailValidator(object):
+    """
+    Validates many emails concurrently: syntax/MX per address, disposable check once per domain
+    over pooled keep-alive connections (at most max_workers idle ones are kept)
+    """
+
+    MX_KEY_PREFIX = 'mx:'
+    DISPOSABLE_KEY_PREFIX = 'disposable:'
+
+    def __init__(self, check_mx=False, max_workers=16, rate_limit=None,
+                 disposable_check_url=DISPOSABLE_CHECK_URL, timeout=10, cache=None, disposable_index=None):
+        self.check_mx_ = check_mx
+        self.cache_ = cache
+        self.disposable_index_ = disposable_index
+        self.max_workers_ = max_workers
+        self.rate_limiter_ = RateLimiter(rate_limit) if rate_limit else None
+        self.disposable_check_url_ = disposable_check_url
+        self.timeout_ = timeout
+        self.ssl_context_ = None
+        self.connections_ = []  # idle keep-alive connections
+        self.connections_lock_ = threading.Lock()
+
+    def _acquire_connection(self):
+        import http.client
+
+        with self.connections_lock_:
+            if self.connections_:
+                return self.connections_.pop()
+
+        url = urlsplit(self.disposable_check_url_)
+        if url.scheme == 'https':
+            if not self.ssl_context_:
+                import ssl
+                self.ssl_context_ = ssl._create_unverified_context()
+            connection = http.client.HTTPSConnection(url.netloc, timeout=self.timeout_, context=self.ssl_context_)
+        else:
+            connection = http.client.HTTPConnection(url.netloc, timeout=self.timeout_)
+        return connection
+
+    def _release_connection(self, connection):
+        with self.connections_lock_:
+            if len(self.connections_) < self.max_workers_:
+                self.connections_.append(connection)
+                return
+        connection.close()
+
+    def is_valid_syntax(self, email: str) -> bool:
+        if self.cache_ is None:
+            return bool(validate_email(email, check_mx=self.check_mx_))
+
+        # mx validity depends on domain only, so check it once per domain
+        if not validate_email(email, check_mx=False):
+            return False
+        return not self.check_mx_ or self.has_valid_mx(email_domain(email))
+
+    def has_valid_mx(self, domain: str) -> bool:
+        key = EmailValidator.MX_KEY_PREFIX + domain
+        cached = self.cache_.get(key) if self.cache_ is not None else None
+        if cached is not None:
+            return cached
+
+        valid = bool(validate_email('postmaster@' + domain, check_mx=True))
+        if self.cache_ is not None:
+            self.cache_.put(key, valid, not valid)
+        return valid
+
+    def is_disposable(self, domain: str) -> bool:
+        if self.disposable_index_ is not None:  # offline mode
+            return self.disposable_index_.is_disposable(domain)
+
+        key = EmailValidator.DISPOSABLE_KEY_PREFIX + domain
+        cached = self.cache_.get(key) if self.cache_ is not None else None
+        if cached is not None:
+            return cached
+
+        disposable, definitive = self._query_disposable(domain)
+        if self.cache_ is not None and definitive:
+            self.cache_.put(key, disposable)
+        return disposable
+
+    def _query_disposable(self, domain: str):
+        # returns (disposable, definitive)
+        import http.client
+
+        if self.rate_limiter_:
+            self.rate_limiter_.acquire()
+
+        path = urlsplit(self.disposable_check_url_).path + quote(domain)
+        for attempt in range(2):  # keep-alive connection may be closed by server
+            connection = self._acquire_connection()
+            try:
+                connection.request('GET', path, headers={'Connection': 'keep-alive'})
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if attempt:
+                    raise
+        self._release_connection(connection)
+
+        if response.status != 200:
+            # rate limited or server error: this check fails, but the verdict is unknown and must not be cached
+            return True, False
+
+        json_object = json.loads(data.decode("utf-8"))
+        return bool(json_object['disposable']), True
+
+    def validate_many(self, emails: list) -> list:
+        """
+        Validity of every email, in the same order
+        """
+        emails = list(emails)
+        with ThreadPoolExecutor(max_workers=self.max_workers_) as executor:
+            valid = list(executor.map(lambda x: bool(validate_email(x, check_mx=False)), emails))
+            domains = sorted({email_domain(email) for email, ok in zip(emails, valid) if ok})
+            if self.check_mx_:
+                mx_valid = dict(zip(domains, executor.map(self.has_valid_mx, domains)))
+                valid = [ok and mx_valid[email_domain(email)] for email, ok in zip(emails, valid)]
+                domains = [domain for domain in domains if mx_valid[domain]]
+            disposable = dict(zip(domains, executor.map(self.is_disposable, domains)))
+
+        return [ok and not disposable[email_domain(email)] for email, ok in zip(emails, valid)]
+
+    def is_valid(self, email: str) -> bool:
+        if not self.is_valid_syntax(email):
+            return False
+        return not self.is_disposable(email_domain(email))
+
+    def close(self):
+        with self.connections_lock_:
+            for connection in self.connections_:
+                connection.close()
+            self.connections_ = []
+        if self.cache_ is not None:
+            self.cache_.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_DEFAULT_VALIDATORS = {}  # check_mx -> EmailValidator used by utils.is_valid_email
+_DEFAULT_CACHE = None
+_DEFAULT_DISPOSABLE_INDEX = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def configure_default_validator(cache=None, disposable_index=None):
+    """
+    Verdict cache shared by utils.is_valid_email calls, in-memory DomainVerdictCache if None;
+    with disposable_index (DisposableDomainIndex) disposable checks run offline
+    """
+    global _DEFAULT_CACHE, _DEFAULT_DISPOSABLE_INDEX
+    with _DEFAULT_LOCK:
+        for validator in _DEFAULT_VALIDATORS.values():
+            validator.close()
+        _DEFAULT_VALIDATORS.clear()
+        _DEFAULT_CACHE = cache
+        _DEFAULT_DISPOSABLE_INDEX = disposable_index
+
+
+def _close_default_validators():
+    # saves a persisted default cache on interpreter exit
+    with _DEFAULT_LOCK:
+        for validator in _DEFAULT_VALIDATORS.values():
+            validator.close()
+        _DEFAULT_VALIDATORS.clear()
+
+
+atexit.register(_close_default_validators)
+
+
+def default_validator(check_mx=False) -> EmailValidator:
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        validator = _DEFAULT_VALIDATORS.get(check_mx)
+        if not validator:
+            if _DEFAULT_CACHE is None:
+                _DEFAULT_CACHE = DomainVerdictCache()
+            validator = EmailValidator(check_mx, cache=_DEFAULT_CACHE, disposable_index=_DEFAULT_DISPOSABLE_INDEX)
+            _DEFAULT_VALIDATORS[check_mx] = validator
+        return validator
+
+
+def validate_emails(emails: list, check_mx=False, max_workers=16, rate_limit=None,
+                    disposable_check_url=DISPOSABLE_CHECK_URL, cache=None, disposable_index=None) -> list:
+    with EmailValidator(check_mx, max_workers, rate_limit, disposable_check_url, cache=cache,
+                        disposable_index=disposable_index) as validator:
+        return validator.validate_many(emails)
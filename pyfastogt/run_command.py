@@ -1,10 +1,12 @@
 import re
 import subprocess
+import time
 
 
 class MessageType:
     STATUS = 1
     MESSAGE = 2
+    ERROR = 3  # stderr line
 
 
 class Message(object):
@@ -19,14 +21,50 @@ class Message(object):
         return self.type_
 
 
+MAKE_PERCENT_RE = re.compile(r'\A\[\s*(\d+)%\]')
+MAKE_PERCENT_BYTES_RE = re.compile(rb'\A\s*\[\s*(\d+)%\]')
+NINJA_RANGE_RE = re.compile(r'\A\[(\d+)/(\d+)\]')
+NINJA_RANGE_BYTES_RE = re.compile(rb'\A\s*\[(\d+)/(\d+)\]')
+
+
+def _overrides(policy, base, names) -> bool:
+    # subclasses overriding line handling of base must keep receiving every decoded line
+    return any(getattr(type(policy), name) is not getattr(base, name) for name in names)
+
+
 class Policy(object):
-    def __init__(self, cb=None):
+    def __init__(self, cb=None, coalesce_interval=None):
+        """
+        coalesce_interval: if set, MESSAGE callbacks fire only when progress changes
+        or at least coalesce_interval seconds passed since the previous one
+        """
         self.progress_ = 0.0
         self.cb_ = cb
+        self.coalesce_interval_ = coalesce_interval
+        self.reported_progress_ = None
+        self.reported_at_ = 0.0
+
+    def _should_report(self, progress) -> bool:
+        if self.coalesce_interval_ is None or self.reported_progress_ is None:
+            return True
+        if int(progress) != int(self.reported_progress_):
+            return True
+        return time.monotonic() - self.reported_at_ >= self.coalesce_interval_
 
     def process(self, message):
-        if self.cb_:
-            self.cb_(self.progress_, message)
+        if not self.cb_:
+            return
+
+        if message.type() == MessageType.MESSAGE and not self._should_report(self.progress_):
+            return
+
+        self.reported_progress_ = self.progress_
+        self.reported_at_ = time.monotonic()
+        self.cb_(self.progress_, message)
+
+    def process_raw(self, line: bytes):
+        # raw stdout line, decoded only if it is going to be used
+        self.process(Message(line.strip().decode("utf-8", "replace"), MessageType.MESSAGE))
 
     def update_progress_message(self, progress, message):
         self.progress_ = progress
@@ -35,25 +73,44 @@ class Policy(object):
 
 
 class CommonPolicy(Policy):
-    def __init__(self, cb):
-        Policy.__init__(self, cb)
+    def __init__(self, cb, coalesce_interval=None):
+        Policy.__init__(self, cb, coalesce_interval)
 
 
 class CmakePolicy(Policy):
-    def __init__(self, cb):
-        Policy.__init__(self, cb)
+    def __init__(self, cb, coalesce_interval=None):
+        Policy.__init__(self, cb, coalesce_interval)
+        self.raw_fast_path_ = not _overrides(self, CmakePolicy, ['process'])
+
+    def _should_report(self, progress) -> bool:
+        # progress is a line counter here, so coalesce by interval only
+        if self.coalesce_interval_ is None or self.reported_progress_ is None:
+            return True
+        return time.monotonic() - self.reported_at_ >= self.coalesce_interval_
 
     def process(self, message):
         self.progress_ += 1.0
         super(CmakePolicy, self).process(message)
 
+    def process_raw(self, line: bytes):
+        if not self.raw_fast_path_:
+            Policy.process_raw(self, line)
+            return
+
+        if not self.cb_ or not self._should_report(self.progress_ + 1.0):
+            self.progress_ += 1.0
+            return
+
+        super(CmakePolicy, self).process_raw(line)
+
     def update_progress_message(self, progress, message):
         super(CmakePolicy, self).update_progress_message(progress, message)
 
 
 class MakePolicy(Policy):
-    def __init__(self, cb):
-        Policy.__init__(self, cb)
+    def __init__(self, cb, coalesce_interval=None):
+        Policy.__init__(self, cb, coalesce_interval)
+        self.raw_fast_path_ = not _overrides(self, MakePolicy, ['process', 'parse_message_to_get_percent'])
 
     def process(self, message):
         if message.type() != MessageType.MESSAGE:
@@ -67,6 +124,23 @@ class MakePolicy(Policy):
         self.progress_ = cur
         super(MakePolicy, self).process(message)
 
+    def process_raw(self, line: bytes):
+        if not self.raw_fast_path_:
+            Policy.process_raw(self, line)
+            return
+
+        res = MAKE_PERCENT_BYTES_RE.match(line)
+        if not res:
+            return
+
+        cur = float(res.group(1))
+        if not cur:
+            return
+
+        self.progress_ = cur
+        if self.cb_ and self._should_report(cur):
+            Policy.process(self, Message(line.strip().decode("utf-8", "replace"), MessageType.MESSAGE))
+
     def update_progress_message(self, progress, message):
         super(MakePolicy, self).update_progress_message(progress, message)
 
@@ -74,7 +148,7 @@ class MakePolicy(Policy):
         if not message:
             return None
 
-        res = re.search(r'\A\[  (\d+)%\]', message)
+        res = MAKE_PERCENT_RE.search(message)
         if res:
             return float(res.group(1))
 
@@ -82,8 +156,9 @@ class MakePolicy(Policy):
 
 
 class NinjaPolicy(Policy):
-    def __init__(self, cb):
-        Policy.__init__(self, cb)
+    def __init__(self, cb, coalesce_interval=None):
+        Policy.__init__(self, cb, coalesce_interval)
+        self.raw_fast_path_ = not _overrides(self, NinjaPolicy, ['process', 'parse_message_to_get_range'])
 
     def process(self, message):
         if message.type() != MessageType.MESSAGE:
@@ -97,6 +172,23 @@ class NinjaPolicy(Policy):
         self.progress_ = cur / total * 100.0
         super(NinjaPolicy, self).process(message)
 
+    def process_raw(self, line: bytes):
+        if not self.raw_fast_path_:
+            Policy.process_raw(self, line)
+            return
+
+        res = NINJA_RANGE_BYTES_RE.match(line)
+        if not res:
+            return
+
+        total = float(res.group(2))
+        if not total:
+            return
+
+        self.progress_ = float(res.group(1)) / total * 100.0
+        if self.cb_ and self._should_report(self.progress_):
+            Policy.process(self, Message(line.strip().decode("utf-8", "replace"), MessageType.MESSAGE))
+
     def update_progress_message(self, progress, message):
         super(NinjaPolicy, self).update_progress_message(progress, message)
 
@@ -104,23 +196,110 @@ class NinjaPolicy(Policy):
         if not message:
             return None, None
 
-        res = re.search(r'\A\[(\d+)/(\d+)\]', message)
+        res = NINJA_RANGE_RE.search(message)
         if res:
             return float(res.group(1)), float(res.group(2))
 
         return None, None
 
 
-def run_command_cb(cmd: list, policy=Policy()):
+STREAM_LINE_LIMIT = 1 << 20
+
+
+async def _read_line(stream) -> bytes:
+    import asyncio
+
+    try:
+        return await stream.readuntil(b'\n')
+    except asyncio.IncompleteReadError as ex:  # last line without newline, b'' at eof
+        return ex.partial
+    except asyncio.LimitOverrunError as ex:  # oversized line is passed on in STREAM_LINE_LIMIT pieces
+        return await stream.read(max(ex.consumed, 1))
+
+
+async def _pump_stream(stream, policy, message_type):
+    while True:
+        output = await _read_line(stream)
+        if not output:
+            break
+        if message_type == MessageType.MESSAGE:
+            policy.process_raw(output)
+            continue
+        line = output.strip()
+        policy.process(Message(line.decode("utf-8", "replace"), message_type))
+
+
+async def run_command_async(cmd: list, policy=Policy(), timeout=None, cwd=None, env=None) -> int:
+    """
+    Run cmd streaming stdout/stderr through policy, returns exit code;
+    kills the process on timeout (subprocess.TimeoutExpired) or cancellation
+    """
+    import asyncio
+
+    policy.update_progress_message(0.0, 'Command {0} started'.format(cmd))
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE, cwd=cwd, env=env,
+                                                   limit=STREAM_LINE_LIMIT)
+
+    async def communicate():
+        await asyncio.gather(_pump_stream(process.stdout, policy, MessageType.MESSAGE),
+                             _pump_stream(process.stderr, policy, MessageType.ERROR))
+        return await process.wait()
+
     try:
-        policy.update_progress_message(0.0, 'Command {0} started'.format(cmd))
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-        for output in process.stdout:
-            line = output.strip()
-            policy.process(Message(line.decode("utf-8"), MessageType.MESSAGE))
-        rc = process.poll()
+        rc = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        policy.update_progress_message(100.0, 'Command {0} timed out after {1}s'.format(cmd, timeout))
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except BaseException:
+        await _kill(process)
+        raise
+
+    if rc == 0:
         policy.update_progress_message(100.0, 'Command {0} finished successfully'.format(cmd))
-    except subprocess.CalledProcessError as ex:
+    else:
+        policy.update_progress_message(100.0, 'Command {0} finished with exit code {1}'.format(cmd, rc))
+    return rc
+
+
+async def _kill(process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+
+async def run_commands_async(commands: list, max_concurrency=None, timeout=None) -> list:
+    """
+    commands: list of (cmd, policy), returns exit codes in the same order
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run(cmd, policy):
+        if not semaphore:
+            return await run_command_async(cmd, policy, timeout)
+        async with semaphore:
+            return await run_command_async(cmd, policy, timeout)
+
+    return await asyncio.gather(*[run(cmd, policy) for cmd, policy in commands])
+
+
+def run_commands(commands: list, max_concurrency=None, timeout=None) -> list:
+    import asyncio  # ~50 ms to import, most callers of this module never run a command
+    return asyncio.run(run_commands_async(commands, max_concurrency, timeout))
+
+
+def run_command_cb(cmd: list, policy=Policy(), timeout=None):
+    import asyncio
+
+    try:
+        rc = asyncio.run(run_command_async(cmd, policy, timeout))
+    except (OSError, subprocess.SubprocessError) as ex:
         policy.update_progress_message(100.0, 'Command {0} finished with exception {1}'.format(cmd, str(ex)))
         raise ex
 
@@ -0,0 +1,151 @@
+import contextlib
+import functools
+import os
+import subprocess
+import threading
+import time
+
+
+class Tracer(object):
+    """
+    Collects spans as Chrome trace-event ('X' complete events), viewable in Perfetto/chrome://tracing
+    """
+
+    def __init__(self, path: str, owner_pid=None):
+        self.path_ = os.path.abspath(path)
+        self.owner_pid_ = owner_pid or os.getpid()
+        self.events_ = []
+        self.lock_ = threading.Lock()
+
+    def path(self) -> str:
+        return self.path_
+
+    def owner_pid(self) -> int:
+        return self.owner_pid_
+
+    def events(self) -> list:
+        return self.events_
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, args=None):
+        start = time.time()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'ts': int(start * 1e6),
+                     'dur': int((time.time() - start) * 1e6), 'pid': os.getpid(), 'tid': threading.get_ident()}
+            if args:
+                event['args'] = args
+            with self.lock_:
+                self.events_.append(event)
+
+    def _worker_path(self) -> str:
+        return '{0}.{1}.part'.format(self.path_, os.getpid())
+
+    def flush(self):
+        # worker processes hand their events to the owner via part files
+        if os.getpid() == self.owner_pid_:
+            return
+        import json
+
+        pid = os.getpid()
+        with self.lock_:
+            events, self.events_ = self.events_, []
+        # spans inherited from the owner through fork are saved by the owner itself
+        events = [x for x in events if x['pid'] == pid]
+        if not events:
+            return
+        with open(self._worker_path(), 'a') as f:
+            for event in events:
+                f.write(json.dumps(event))
+                f.write('\n')
+
+    def save(self):
+        import glob
+        import json
+
+        events = list(self.events_)
+        for part in glob.glob('{0}.*.part'.format(glob.escape(self.path_))):
+            with open(part, 'r') as f:
+                events.extend(json.loads(line) for line in f if line.strip())
+            os.remove(part)
+
+        events.sort(key=lambda x: x['ts'])
+        with open(self.path_, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+_TRACER = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def start_tracing(path: str) -> Tracer:
+    global _TRACER
+    _TRACER = Tracer(path)
+    return _TRACER
+
+
+def attach_tracing(path: str, owner_pid: int) -> Tracer:
+    """
+    Tracer of worker process: created for spawn/forkserver start methods, a forked copy of the owner's
+    one drops the inherited spans
+    """
+    global _TRACER
+    if not _TRACER:
+        _TRACER = Tracer(path, owner_pid)
+    elif os.getpid() != _TRACER.owner_pid():
+        _TRACER.events_ = []
+        _TRACER.lock_ = threading.Lock()
+    return _TRACER
+
+
+def stop_tracing():
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    if tracer:
+        tracer.save()
+    return tracer
+
+
+def current_tracer() -> Tracer:
+    return _TRACER
+
+
+def span(name: str, category='phase', args=None):
+    if not _TRACER:
+        return _NULL_SPAN
+    return _TRACER.span(name, category, args)
+
+
+def flush():
+    if _TRACER:
+        _TRACER.flush()
+
+
+def traced(phase: str):
+    """
+    Decorator recording each call of function as a phase span, string arguments go to span args
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _TRACER:
+                return func(*args, **kwargs)
+            span_args = {'function': func.__name__, 'args': [x for x in args if isinstance(x, str)]}
+            with _TRACER.span(phase, 'phase', span_args):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def call(cmd: list, phase=None, **kwargs) -> int:
+    """
+    subprocess.call recorded as a command span
+    """
+    if not _TRACER:
+        return subprocess.call(cmd, **kwargs)
+    with _TRACER.span(phase or os.path.basename(cmd[0]), 'command', {'cmd': ' '.join(cmd), 'cwd': os.getcwd()}):
+        return subprocess.call(cmd, **kwargs)
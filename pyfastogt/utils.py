@@ -1,14 +1,40 @@
+import array
+import bisect
 import errno
+import hashlib
+import heapq
 import os
 import re
 import shutil
 import subprocess
-import tarfile
-import json
-import ssl
-import certifi
-from validate_email import validate_email
-from urllib.request import urlopen
+import mmap
+import time
+from pyfastogt import trace
+
+# heavy dependencies are imported on first use, module attributes kept for callers (PEP 562)
+_LAZY_ATTRIBUTES = {
+    'certifi': ('certifi', None),
+    'json': ('json', None),
+    'ssl': ('ssl', None),
+    'tarfile': ('tarfile', None),
+    'validate_email': ('validate_email', 'validate_email'),
+    'URLError': ('urllib.error', 'URLError'),
+    'HTTPError': ('urllib.error', 'HTTPError'),
+    'urlopen': ('urllib.request', 'urlopen'),
+    'Request': ('urllib.request', 'Request'),
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+    import importlib
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    value = importlib.import_module(module_name)
+    if attribute:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
 
 
 class CommonError(Exception):
@@ -20,95 +46,318 @@ class CommonError(Exception):
 
 
 def is_valid_email(email: str, check_mx: bool) -> bool:
-    dns_valid = validate_email(email, check_mx=check_mx)
-    if not dns_valid:
-        return False
+    """
+    Syntax (and MX) check plus disposable-domain check; verdicts are cached per domain and the
+    disposable check can run offline, see email_validation.configure_default_validator
+    """
+    from pyfastogt import email_validation
+    return email_validation.default_validator(check_mx).is_valid(email)
 
-    validate_url = 'https://open.kickbox.com/v1/disposable/' + email
-    context = ssl._create_unverified_context()
-    response = urlopen(validate_url, context=context)
-    if response.status != 200:
-        return False
 
-    data = response.read()
-    json_object = json.loads(data.decode("utf-8"))
-    is_disposable = json_object['disposable']
-    return not is_disposable
+EMAIL_RE = re.compile(r'([^@]+)@[a-z0-9-]+(\.[a-z0-9-]+)*(\.[a-z]{2,12})$')
+ROLE_BASED_EMAIL_PREFIXES = frozenset(['noreply', 'support', 'admin', 'postmaster'])
+EXTENDED_ROLE_BASED_EMAIL_PREFIXES = ROLE_BASED_EMAIL_PREFIXES | frozenset(['no-reply', 'info', 'abuse'])
 
 
 def is_role_based_email(email: str) -> bool:
-    r = re.compile('([^@]+)@[a-z0-9-]+(\.[a-z0-9-]+)*(\.[a-z]{2,12})$')
-    match = r.match(email)
+    match = EMAIL_RE.match(email)
     if not match:
         return False
 
-    start = match.group(1)
-    for x in ['noreply', 'support', 'admin', 'postmaster']:
-        if start == x:
-            return True
+    return match.group(1) in ROLE_BASED_EMAIL_PREFIXES
 
-    return False
 
+class RoleEmailClassifier(object):
+    """
+    Bulk role-based email classification; emails are lowercased and,
+    with normalize_plus, plus-addressing tags dropped (support+tag@ -> support@)
+    """
 
-def read_file_line_by_line_to_list(file) -> list:
+    def __init__(self, prefixes=EXTENDED_ROLE_BASED_EMAIL_PREFIXES, normalize_plus=True):
+        self.prefixes_ = frozenset(x.lower() for x in prefixes)
+        self.normalize_plus_ = normalize_plus
+
+    def prefixes(self) -> frozenset:
+        return self.prefixes_
+
+    def is_role_based(self, email: str) -> bool:
+        match = EMAIL_RE.match(email.lower())
+        if not match:
+            return False
+
+        local = match.group(1)
+        if self.normalize_plus_:
+            local = local.split('+', 1)[0]
+        return local in self.prefixes_
+
+    def classify(self, emails, batch_size=10000):
+        """
+        Yield lists of (email, is_role_based) of up to batch_size items
+        """
+        is_role_based = self.is_role_based
+        batch = []
+        for email in emails:
+            batch.append((email, is_role_based(email)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def classify_file(self, file, batch_size=10000):
+        return self.classify((x for x in iter_file_lines(file) if x), batch_size)
+
+
+READ_CHUNK_SIZE = 1 << 20
+
+
+def iter_file_line_chunks(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Lazily yield lists of stripped lines, decoding the file chunk_size characters at a time
+    """
     if not os.path.exists(file):
         raise CommonError('file path: {0} not exists'.format(file))
 
-    file_array = []
     with open(file, "r") as ins:
-        for line in ins:
-            file_array.append(line.strip())
+        tail = ''
+        while True:
+            chunk = ins.read(chunk_size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split('\n')
+            tail = lines.pop()
+            yield [line.strip() for line in lines]
+        if tail:
+            yield [tail.strip()]
+
+
+def iter_file_lines(file):
+    for lines in iter_file_line_chunks(file):
+        yield from lines
+
+
+def iter_file_lines_mmap(file):
+    """
+    Lazily yield stripped lines as bytes from memory-mapped file
+    """
+    if not os.path.exists(file):
+        raise CommonError('file path: {0} not exists'.format(file))
+
+    if not os.path.getsize(file):
+        return
+
+    with open(file, "rb") as ins, mmap.mmap(ins.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        size = len(mapped)
+        start = 0
+        while start < size:
+            end = mapped.find(b'\n', start)
+            if end == -1:
+                end = size
+            yield mapped[start:end].strip()
+            start = end + 1
+
+
+def read_file_line_by_line_to_list(file) -> list:
+    file_array = []
+    for lines in iter_file_line_chunks(file):
+        file_array.extend(lines)
 
     return file_array
 
 
 def read_file_line_by_line_to_set(file) -> set:
-    if not os.path.exists(file):
-        raise CommonError('file path: {0} not exists'.format(file))
-
     file_set = set()
-    with open(file, "r") as ins:
-        for line in ins:
-            file_set.add(line.strip())
+    for lines in iter_file_line_chunks(file):
+        file_set.update(lines)
 
     return file_set
 
 
-def download_file(url):
-    current_dir = os.getcwd()
-    file_name = url.split('/')[-1]
-    response = urlopen(url, cafile=certifi.where())
-    if response.status != 200:
+def _line_digest(line: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), 'little')
+
+
+def _sorted_unique(values: array.array, chunk_size=1 << 20) -> array.array:
+    # sorts bounded chunks and merges them, so only one chunk at a time exists as python ints
+    chunks = [array.array(values.typecode, sorted(values[i:i + chunk_size]))
+              for i in range(0, len(values), chunk_size)]
+    result = array.array(values.typecode)
+    last = None
+    for value in heapq.merge(*chunks):
+        if value != last:
+            result.append(value)
+            last = value
+    return result
+
+
+class CompactLineSet(object):
+    """
+    Deduplicated set of file lines kept as sorted 64-bit digests (8 bytes per unique line),
+    membership may give false positives with ~n/2^64 probability
+    """
+
+    def __init__(self, file):
+        digests = array.array('Q', (_line_digest(line) for line in iter_file_lines_mmap(file)))
+        numpy = _numpy()
+        if numpy is not None:
+            unique = numpy.unique(numpy.frombuffer(digests, dtype=numpy.uint64))
+        else:
+            unique = _sorted_unique(digests)
+        self.index_ = SortedIndex(unique, 'Q', True)
+
+    def __len__(self):
+        return len(self.index_)
+
+    def __contains__(self, line):
+        if isinstance(line, str):
+            line = line.encode('utf-8')
+        return _line_digest(line.strip()) in self.index_
+
+    def contains_many(self, lines):
+        return self.index_.contains_many(
+            [_line_digest((x.encode('utf-8') if isinstance(x, str) else x).strip()) for x in lines])
+
+
+DOWNLOAD_BLOCK_SIZE = 1 << 16
+DOWNLOAD_RETRIES = 3
+DEFAULT_DOWNLOAD_CACHE_DIR = '~/.cache/pyfastogt/downloads'
+
+
+def _urlopen_for_download(url: str, offset=0):
+    from urllib.request import urlopen, Request
+
+    request = Request(url)
+    if offset:
+        request.add_header('Range', 'bytes={0}-'.format(offset))
+    if url.startswith('https'):
+        import certifi
+        import ssl
+        return urlopen(request, context=ssl.create_default_context(cafile=certifi.where()))
+    return urlopen(request)
+
+
+def _hash_file(path: str, sha):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_BLOCK_SIZE), b''):
+            sha.update(chunk)
+
+
+def _download_to(url: str, file_path: str, sha):
+    # resumes partial file_path if it exists, updates sha with every byte of the file
+    offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    response = _urlopen_for_download(url, offset)
+    if response.status == 206:
+        _hash_file(file_path, sha)
+        mode = 'ab'
+    elif response.status == 200:
+        offset = 0
+        mode = 'wb'
+    else:
         raise CommonError(
             "Can't fetch url: {0}, status: {1}, response: {2}".format(url, response.status, response.reason))
 
-    f = open(file_name, 'wb')
     file_size = 0
     header = response.getheader("Content-Length")
     if header:
-        file_size = int(header)
-
-    print("Downloading: {0} Bytes: {1}".format(file_name, file_size))
-
-    file_size_dl = 0
-    block_sz = 8192
-    while True:
-        buffer = response.read(block_sz)
-        if not buffer:
-            break
-
-        file_size_dl += len(buffer)
-        f.write(buffer)
-        percent = 0 if not file_size else file_size_dl * 100. / file_size
-        status = r"%10d  [%3.2f%%]" % (file_size_dl, percent)
-        status += chr(8) * (len(status) + 1)
-        print(status, end='\r')
-
-    f.close()
-    return os.path.join(current_dir, file_name)
+        file_size = int(header) + offset
+
+    print("Downloading: {0} Bytes: {1}".format(url.split('/')[-1], file_size))
+
+    file_size_dl = offset
+    with open(file_path, mode) as f:
+        while True:
+            buffer = response.read(DOWNLOAD_BLOCK_SIZE)
+            if not buffer:
+                break
+
+            file_size_dl += len(buffer)
+            f.write(buffer)
+            sha.update(buffer)
+            percent = 0 if not file_size else file_size_dl * 100. / file_size
+            status = r"%10d  [%3.2f%%]" % (file_size_dl, percent)
+            status += chr(8) * (len(status) + 1)
+            print(status, end='\r')
+    response.close()
+
+    if file_size and file_size_dl != file_size:
+        raise CommonError('Incomplete download of url: {0}, {1} of {2} bytes'.format(url, file_size_dl, file_size))
+
+
+def _download_with_retries(url: str, file_path: str, retries: int) -> str:
+    from urllib.error import URLError, HTTPError
+
+    for attempt in range(retries + 1):
+        sha = hashlib.sha256()
+        try:
+            _download_to(url, file_path, sha)
+            return sha.hexdigest()
+        except HTTPError as ex:
+            if ex.code == 416 and os.path.exists(file_path):  # stale partial file
+                os.remove(file_path)
+            elif ex.code < 500:
+                raise CommonError("Can't fetch url: {0}, status: {1}, response: {2}".format(url, ex.code, ex.reason))
+            error = ex
+        except (URLError, ConnectionError, CommonError, OSError) as ex:
+            error = ex
+        print('Download of {0} failed: {1}'.format(url, error))
+        if attempt < retries:
+            time.sleep(2 ** attempt)
+    raise CommonError("Can't fetch url: {0}, error: {1}".format(url, error))
+
+
+def _link_or_copy(src: str, dst: str):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
 
 
+@trace.traced('download')
+def download_file(url, expected_sha256=None, cache_dir=None, retries=DOWNLOAD_RETRIES):
+    current_dir = os.getcwd()
+    file_name = url.split('/')[-1]
+    file_path = os.path.join(current_dir, file_name)
+    if expected_sha256:
+        expected_sha256 = expected_sha256.lower()
+
+    if not cache_dir:
+        # only our own partial file is resumed, a same-named file in cwd (maybe a hard link into the cache)
+        # is replaced, never appended to
+        partial_path = file_path + '.part'
+        digest = _download_with_retries(url, partial_path, retries)
+        if expected_sha256 and digest != expected_sha256:
+            os.remove(partial_path)
+            raise CommonError('Checksum mismatch for url: {0}, expected: {1}, got: {2}'.format(url, expected_sha256,
+                                                                                             digest))
+        os.replace(partial_path, file_path)
+        return file_path
+
+    key = hashlib.sha256('{0}\0{1}'.format(url, expected_sha256 or '').encode('utf-8')).hexdigest()
+    entry_dir = os.path.join(os.path.expanduser(cache_dir), key)
+    os.makedirs(entry_dir, exist_ok=True)
+    cached_path = os.path.join(entry_dir, file_name)
+    if os.path.exists(cached_path):
+        print("Using cached download: {0}".format(cached_path))
+        _link_or_copy(cached_path, file_path)
+        return file_path
+
+    partial_path = cached_path + '.part'
+    digest = _download_with_retries(url, partial_path, retries)
+    if expected_sha256 and digest != expected_sha256:
+        os.remove(partial_path)
+        raise CommonError('Checksum mismatch for url: {0}, expected: {1}, got: {2}'.format(url, expected_sha256,
+                                                                                         digest))
+    os.replace(partial_path, cached_path)
+    _link_or_copy(cached_path, file_path)
+    return file_path
+
+
+@trace.traced('extract')
 def extract_file(path, remove_after_extract=True):
+    import tarfile
+
     current_dir = os.getcwd()
     print("Extracting: {0}".format(path))
     try:
@@ -129,23 +378,248 @@ def extract_file(path, remove_after_extract=True):
     return os.path.join(current_dir, target_path)
 
 
-def git_clone(url: str, branch=None, remove_dot_git=True):
+class _StreamTee(object):
+    # file-like wrapper hashing (and optionally saving) every byte read from response
+    def __init__(self, response, sha, out_file=None):
+        self.response_ = response
+        self.sha_ = sha
+        self.out_file_ = out_file
+
+    def read(self, size=-1):
+        buffer = self.response_.read(size)
+        self.sha_.update(buffer)
+        if self.out_file_:
+            self.out_file_.write(buffer)
+        return buffer
+
+
+def _extract_member(tar_file, member, path: str):
+    if hasattr(tar_file, 'extraction_filter'):  # python 3.12 and security backports
+        tar_file.extract(member, path, filter='data')
+        return
+
+    name = os.path.normpath(member.name)
+    if os.path.isabs(name) or name.split(os.sep)[0] == '..' or member.issym() or member.islnk():
+        raise CommonError('Unsafe archive member: {0}'.format(member.name))
+    tar_file.extract(member, path)
+
+
+def _move_tree_entries(src_dir: str, dst_dir: str):
+    for name in os.listdir(src_dir):
+        src = os.path.join(src_dir, name)
+        dst = os.path.join(dst_dir, name)
+        if os.path.isdir(src) and not os.path.islink(src) and os.path.isdir(dst):
+            shutil.copytree(src, dst, symlinks=True, dirs_exist_ok=True)
+            shutil.rmtree(src)
+        else:
+            os.replace(src, dst)
+
+
+@trace.traced('download+extract')
+def download_and_extract_file(url, expected_sha256=None, cache_dir=None):
+    """
+    Extract tar archive while downloading it, without intermediate file;
+    members land in a temporary directory and are moved into place once the digest matches
+    """
+    import tarfile
+    import tempfile
+
+    current_dir = os.getcwd()
+    file_name = url.split('/')[-1]
+    if expected_sha256:
+        expected_sha256 = expected_sha256.lower()
+
+    cached_path = None
+    if cache_dir:
+        key = hashlib.sha256('{0}\0{1}'.format(url, expected_sha256 or '').encode('utf-8')).hexdigest()
+        entry_dir = os.path.join(os.path.expanduser(cache_dir), key)
+        os.makedirs(entry_dir, exist_ok=True)
+        cached_path = os.path.join(entry_dir, file_name)
+        if os.path.exists(cached_path):
+            print("Using cached download: {0}".format(cached_path))
+            _link_or_copy(cached_path, os.path.join(current_dir, file_name))
+            return extract_file(os.path.join(current_dir, file_name))
+
+    response = _urlopen_for_download(url)
+    if response.status != 200:
+        raise CommonError(
+            "Can't fetch url: {0}, status: {1}, response: {2}".format(url, response.status, response.reason))
+
+    print("Downloading and extracting: {0}".format(file_name))
+    sha = hashlib.sha256()
+    out_file = open(cached_path + '.part', 'wb') if cached_path else None
+    extract_dir = tempfile.mkdtemp(prefix='.extract_', dir=current_dir)
+    names = []
+    try:
+        try:
+            with tarfile.open(fileobj=_StreamTee(response, sha, out_file), mode='r|*') as tar_file:
+                for member in tar_file:
+                    names.append(member.name)
+                    _extract_member(tar_file, member, extract_dir)
+            # drain trailing padding so digest covers the whole archive
+            tail = _StreamTee(response, sha, out_file)
+            while tail.read(DOWNLOAD_BLOCK_SIZE):
+                pass
+        finally:
+            response.close()
+            if out_file:
+                out_file.close()
+
+        digest = sha.hexdigest()
+        if expected_sha256 and digest != expected_sha256:
+            raise CommonError('Checksum mismatch for url: {0}, expected: {1}, got: {2}'.format(url, expected_sha256,
+                                                                                             digest))
+        _move_tree_entries(extract_dir, current_dir)
+    except BaseException:
+        if cached_path and os.path.exists(cached_path + '.part'):
+            os.remove(cached_path + '.part')
+        raise
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+
+    if cached_path:
+        os.replace(cached_path + '.part', cached_path)
+    return os.path.join(current_dir, os.path.commonprefix(names))
+
+
+def git_cloned_dir_name(url: str) -> str:
+    return os.path.splitext(url.rsplit('/', 1)[-1])[0]
+
+
+DEFAULT_GIT_MIRROR_DIR = '~/.cache/pyfastogt/git'
+
+
+@trace.traced('git mirror')
+def git_mirror(url: str, mirror_dir: str) -> str:
+    """
+    Create or refresh local bare mirror of url, returns mirror path
+    """
+    mirror_root = os.path.abspath(os.path.expanduser(mirror_dir))
+    os.makedirs(mirror_root, exist_ok=True)
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    name = git_cloned_dir_name(re.sub(r'/\.git/?$', '', url))
+    mirror_path = os.path.join(mirror_root, '{0}-{1}.git'.format(name, key))
+    if os.path.isdir(mirror_path):
+        _git_call(['git', '--git-dir', mirror_path, 'fetch', '--prune', '--quiet', 'origin'], 'git fetch')
+    else:
+        tmp_path = mirror_path + '.tmp.%d' % os.getpid()
+        if trace.call(['git', 'clone', '--mirror', '--quiet', url, tmp_path], 'git clone') != 0:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise CommonError("Can't mirror git repository: {0}".format(url))
+        try:
+            os.rename(tmp_path, mirror_path)
+        except OSError:  # mirrored concurrently
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    return mirror_path
+
+
+def _git_call(line: list, phase=None):
+    if trace.call(line, phase) != 0:
+        raise CommonError('Command failed: {0}'.format(' '.join(line)))
+
+
+def _git_config_get_regexp(pattern: str, file=None) -> list:
+    line = ['git', 'config']
+    if file:
+        line.extend(['-f', file])
+    line.extend(['--get-regexp', pattern])
+    try:
+        output = subprocess.check_output(line)
+    except subprocess.CalledProcessError:  # no matches
+        return []
+    return [x.split(' ', 1) for x in output.decode('utf-8').splitlines() if ' ' in x]
+
+
+def _git_submodule_update_via_mirrors(mirror_dir: str):
+    # must be in repository folder, origin must point to upstream so relative urls resolve
+    if not os.path.exists('.gitmodules'):
+        return
+
+    _git_call(['git', 'submodule', 'init'])
+    urls = {}
+    for key, sub_url in _git_config_get_regexp(r'^submodule\..*\.url$'):
+        urls[key] = sub_url
+        _git_call(['git', 'config', key, git_mirror(sub_url, mirror_dir)])
+    # submodule clones from local paths are denied by default since git 2.38.1 (protocol.file.allow=user)
+    _git_call(['git', '-c', 'protocol.file.allow=always', 'submodule', 'update'], 'git submodule update')
+
+    for key, sub_url in urls.items():
+        _git_call(['git', 'config', key, sub_url])
+        name = key[len('submodule.'):-len('.url')]
+        paths = _git_config_get_regexp(r'^submodule\.{0}\.path$'.format(re.escape(name)), '.gitmodules')
+        if not paths or not os.path.isdir(paths[0][1]):
+            continue
+        pwd = os.getcwd()
+        os.chdir(paths[0][1])
+        try:
+            _git_call(['git', 'remote', 'set-url', 'origin', sub_url])
+            _git_submodule_update_via_mirrors(mirror_dir)
+        finally:
+            os.chdir(pwd)
+
+
+def _remove_dot_git_recursive(directory: str):
+    for root, dirs, files in os.walk(directory):
+        if '.git' in dirs:
+            dirs.remove('.git')
+            shutil.rmtree(os.path.join(root, '.git'))
+        if '.git' in files:  # submodule gitlink
+            os.remove(os.path.join(root, '.git'))
+
+
+@trace.traced('git clone')
+def git_export(url: str, branch=None, jobs=None) -> str:
+    """
+    Checkout only working tree of url (and its submodules) without history
+    """
     current_dir = os.getcwd()
+    cloned_dir_name = git_cloned_dir_name(url)
+    jobs = jobs or os.cpu_count() or 1
+    git_export_line = ['git', 'clone', '--depth=1', '--no-tags', '--single-branch', '--recurse-submodules',
+                       '--shallow-submodules', '--jobs', str(jobs)]
     if branch:
-        common_git_clone_line = ['git', 'clone', '--branch', branch, '--single-branch', url]
+        git_export_line.extend(['--branch', branch])
+    git_export_line.extend([url, cloned_dir_name])
+    _git_call(git_export_line, 'git clone')
+
+    directory = os.path.join(current_dir, cloned_dir_name)
+    _remove_dot_git_recursive(directory)
+    return directory
+
+
+@trace.traced('git clone')
+def git_clone(url: str, branch=None, remove_dot_git=True, mirror_dir=None):
+    if remove_dot_git and not mirror_dir:
+        return git_export(url, branch)
+
+    current_dir = os.getcwd()
+    cloned_dir_name = git_cloned_dir_name(url)
+    if mirror_dir:
+        # local clone from mirror hardlinks objects, so no --depth needed
+        mirror_path = git_mirror(url, mirror_dir)
+        common_git_clone_line = ['git', 'clone']
+        if branch:
+            common_git_clone_line.extend(['--branch', branch, '--single-branch'])
+        common_git_clone_line.extend([mirror_path, cloned_dir_name])
+    elif branch:
+        common_git_clone_line = ['git', 'clone', '--branch', branch, '--single-branch', url, cloned_dir_name]
     else:
-        common_git_clone_line = ['git', 'clone', '--depth=1', url]
-    cloned_dir_name = os.path.splitext(url.rsplit('/', 1)[-1])[0]
-    common_git_clone_line.append(cloned_dir_name)
-    subprocess.call(common_git_clone_line)
+        common_git_clone_line = ['git', 'clone', '--depth=1', url, cloned_dir_name]
+    _git_call(common_git_clone_line, 'git clone')
     os.chdir(cloned_dir_name)
 
-    common_git_clone_init_line = ['git', 'submodule', 'update', '--init', '--recursive']
-    subprocess.call(common_git_clone_init_line)
+    try:
+        if mirror_dir:
+            _git_call(['git', 'remote', 'set-url', 'origin', url])
+            _git_submodule_update_via_mirrors(mirror_dir)
+        else:
+            common_git_clone_init_line = ['git', 'submodule', 'update', '--init', '--recursive']
+            trace.call(common_git_clone_init_line, 'git submodule update')
+    finally:
+        os.chdir(current_dir)
     directory = os.path.join(current_dir, cloned_dir_name)
     if remove_dot_git:
-        shutil.rmtree(os.path.join(directory, '.git'))
-    os.chdir(current_dir)
+        _remove_dot_git_recursive(directory)
     return directory
 
 
@@ -162,17 +636,92 @@ def symlink_force(target, link_name):
 
 # Search for number in array
 def binary_search_impl(number, array, lo, hi):
-    if hi < lo:
-        return False
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if number == array[mid]:
+            return True
+        elif number < array[mid]:
+            hi = mid - 1
+        else:
+            lo = mid + 1
 
-    mid = (lo + hi) // 2
-    if number == array[mid]:
-        return True
-    elif number < array[mid]:
-        return binary_search_impl(number, array, lo, mid - 1)
-    else:
-        return binary_search_impl(number, array, mid + 1, hi)
+    return False
 
 
 def binary_search_number(anum, array):  # convenience interface to binary_search()
     return binary_search_impl(anum, array, 0, len(array) - 1)
+
+
+_NUMPY = False  # not probed yet
+
+
+def _numpy():
+    # optional dependency, imported on first use
+    global _NUMPY
+    if _NUMPY is False:
+        try:
+            import numpy
+            _NUMPY = numpy
+        except ImportError:
+            _NUMPY = None
+    return _NUMPY
+
+
+class SortedIndex(object):
+    """
+    Compact sorted integer array with batch membership and rank queries,
+    numpy backed when available, array + bisect otherwise
+    """
+
+    def __init__(self, values, typecode='q', assume_sorted=False):
+        numpy = _numpy()
+        if numpy is not None:
+            data = numpy.asarray(values, dtype=numpy.dtype(typecode))
+            if not assume_sorted:
+                data = numpy.sort(data)
+        else:
+            data = array.array(typecode, values if assume_sorted else sorted(values))
+        self.data_ = data
+        self.numpy_ = numpy
+
+    def data(self):
+        return self.data_
+
+    def __len__(self):
+        return len(self.data_)
+
+    def rank(self, value) -> int:
+        """
+        Number of elements less than value
+        """
+        if self.numpy_ is not None:
+            return int(self.numpy_.searchsorted(self.data_, value, 'left'))
+        return bisect.bisect_left(self.data_, value)
+
+    def __contains__(self, value):
+        pos = self.rank(value)
+        return pos < len(self.data_) and bool(self.data_[pos] == value)
+
+    def rank_many(self, values):
+        if self.numpy_ is not None:
+            return self.numpy_.searchsorted(self.data_, self.numpy_.asarray(values, dtype=self.data_.dtype), 'left')
+        return [bisect.bisect_left(self.data_, value) for value in values]
+
+    def contains_many(self, values):
+        """
+        Membership of every value, numpy bool array or list of bool
+        """
+        if self.numpy_ is not None:
+            numpy = self.numpy_
+            values = numpy.asarray(values, dtype=self.data_.dtype)
+            pos = numpy.searchsorted(self.data_, values, 'left')
+            found = pos < len(self.data_)
+            found[found] = self.data_[pos[found]] == values[found]
+            return found
+
+        result = []
+        size = len(self.data_)
+        for value in values:
+            pos = bisect.bisect_left(self.data_, value)
+            result.append(pos < size and self.data_[pos] == value)
+        return result
@@ -1,7 +1,228 @@
-import Crypto.Random
-from Crypto.Hash import SHA
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
+import collections
+import functools
+import mmap
+import os
+import threading
+from abc import ABCMeta, abstractmethod
+
+# batches smaller than this are processed in-process, pool startup would dominate
+PROCESS_POOL_MIN_BATCH = 256
+HASH_CHUNK_SIZE = 1 << 20
+
+RSA_ALGORITHM = 'rsa'
+ECDSA_P256_ALGORITHM = 'ecdsa-p256'
+ED25519PH_ALGORITHM = 'ed25519ph'
+
+
+def _sha1(data=None):
+    # Crypto is imported on first use, it dominates import time of this module
+    from Crypto.Hash import SHA
+    return SHA.new(data)
+
+
+def _to_bytes(key_data) -> bytes:
+    return key_data.encode('utf-8') if isinstance(key_data, str) else key_data
+
+
+class _CheckedVerifier(object):
+    # DSS/EdDSA verifiers raise on mismatch, PKCS1_v1_5 returns bool
+    def __init__(self, scheme):
+        self.scheme_ = scheme
+
+    def sign(self, h):
+        return self.scheme_.sign(h)
+
+    def verify(self, h, signature) -> bool:
+        try:
+            self.scheme_.verify(h, signature)
+        except ValueError:
+            return False
+        return True
+
+
+class Algorithm(metaclass=ABCMeta):
+    """
+    Signature scheme: key generation/export, message hash and signer over a parsed key
+    """
+
+    def __init__(self, name: str):
+        self.name_ = name
+
+    def name(self) -> str:
+        return self.name_
+
+    @abstractmethod
+    def new_hash(self, data=None):
+        pass
+
+    @abstractmethod
+    def generate(self, bits_length: int):
+        pass
+
+    @abstractmethod
+    def matches(self, key) -> bool:
+        pass
+
+    @abstractmethod
+    def public_key(self, private_key):
+        pass
+
+    @abstractmethod
+    def new_signer(self, key):
+        pass
+
+    @abstractmethod
+    def export_key(self, key, format='PEM') -> bytes:
+        pass
+
+    @abstractmethod
+    def export_encrypted_key(self, key, passphrase: str) -> bytes:
+        pass
+
+
+class RsaAlgorithm(Algorithm):
+    """
+    PKCS#1 v1.5 RSA with SHA-1
+    """
+
+    def __init__(self):
+        Algorithm.__init__(self, RSA_ALGORITHM)
+
+    def new_hash(self, data=None):
+        return _sha1(data)
+
+    def generate(self, bits_length: int):
+        import Crypto.Random
+        from Crypto.PublicKey import RSA
+        return RSA.generate(bits_length, Crypto.Random.new().read)
+
+    def matches(self, key) -> bool:
+        return hasattr(key, 'n')
+
+    def public_key(self, private_key):
+        return private_key.publickey()
+
+    def new_signer(self, key):
+        from Crypto.Signature import PKCS1_v1_5
+        return PKCS1_v1_5.new(key)
+
+    def export_key(self, key, format='PEM') -> bytes:
+        return key.exportKey(format)
+
+    def export_encrypted_key(self, key, passphrase: str) -> bytes:
+        try:
+            return key.exportKey('PEM', passphrase=passphrase, pkcs=8, protection='scryptAndAES128-CBC')
+        except TypeError:  # PyCrypto, legacy PEM encryption only
+            return key.exportKey('PEM', passphrase=passphrase)
+
+
+class EccAlgorithm(Algorithm):
+    """
+    Elliptic curve scheme from pycryptodome ECC, fixed curve, bits_length is ignored
+    """
+
+    def __init__(self, name: str, curve: str, curve_names: tuple):
+        Algorithm.__init__(self, name)
+        self.curve_ = curve
+        self.curve_names_ = curve_names
+
+    def generate(self, bits_length: int):
+        from Crypto.PublicKey import ECC
+        return ECC.generate(curve=self.curve_)
+
+    def matches(self, key) -> bool:
+        return getattr(key, 'curve', None) in self.curve_names_
+
+    def public_key(self, private_key):
+        return private_key.public_key()
+
+    def export_key(self, key, format='PEM') -> bytes:
+        return _to_bytes(key.export_key(format=format))
+
+    def export_encrypted_key(self, key, passphrase: str) -> bytes:
+        return _to_bytes(key.export_key(format='PEM', passphrase=passphrase, protection='scryptAndAES128-CBC'))
+
+
+class EcdsaP256Algorithm(EccAlgorithm):
+    """
+    ECDSA on NIST P-256 with SHA-256, deterministic signatures (RFC 6979)
+    """
+
+    def __init__(self):
+        EccAlgorithm.__init__(self, ECDSA_P256_ALGORITHM, 'P-256',
+                              ('NIST P-256', 'p256', 'P-256', 'prime256v1', 'secp256r1'))
+
+    def new_hash(self, data=None):
+        from Crypto.Hash import SHA256
+        return SHA256.new(data)
+
+    def new_signer(self, key):
+        from Crypto.Signature import DSS
+        return _CheckedVerifier(DSS.new(key, 'deterministic-rfc6979'))
+
+
+class Ed25519phAlgorithm(EccAlgorithm):
+    """
+    Ed25519ph (RFC 8032 prehashed variant, SHA-512) on Ed25519 keys, so streamed and in-memory signatures
+    are identical; not verifiable as pure Ed25519 signatures
+    """
+
+    def __init__(self):
+        EccAlgorithm.__init__(self, ED25519PH_ALGORITHM, 'Ed25519', ('Ed25519', 'ed25519'))
+
+    def new_hash(self, data=None):
+        from Crypto.Hash import SHA512
+        return SHA512.new(data)
+
+    def new_signer(self, key):
+        from Crypto.Signature import eddsa
+        return _CheckedVerifier(eddsa.new(key, 'rfc8032'))
+
+
+SUPPORTED_ALGORITHMS = [RsaAlgorithm(), EcdsaP256Algorithm(), Ed25519phAlgorithm()]
+
+
+def get_supported_algorithm_by_name(name: str) -> Algorithm:
+    return next((x for x in SUPPORTED_ALGORITHMS if x.name() == name), None)
+
+
+def _parse_key(key_data, passphrase=None):
+    from Crypto.PublicKey import RSA
+
+    try:
+        return RSA.importKey(key_data, passphrase)
+    except (ValueError, IndexError, TypeError) as ex:
+        rsa_error = ex
+    try:
+        from Crypto.PublicKey import ECC
+    except ImportError:  # PyCrypto, RSA only
+        raise rsa_error
+    try:
+        return ECC.import_key(key_data, passphrase)
+    except (ValueError, IndexError, TypeError) as ex:
+        raise ValueError('unsupported key format or wrong passphrase (RSA: {0}; ECC: {1})'.format(
+            rsa_error, ex)) from rsa_error
+
+
+def detect_algorithm(key) -> Algorithm:
+    """
+    Algorithm of parsed key or raw PEM/DER key data
+    """
+    if isinstance(key, (bytes, str)):
+        key = import_key(key)
+    for algorithm in SUPPORTED_ALGORITHMS:
+        if algorithm.matches(key):
+            return algorithm
+    raise ValueError('unsupported key type: {0}'.format(type(key).__name__))
+
+
+@functools.lru_cache(maxsize=128)
+def import_key(key_data):
+    """
+    Parsed key (RSA, ECDSA P-256 or Ed25519) for PEM/DER key_data, shared by every Sign/Verify instance
+    """
+    return _parse_key(key_data)
+
 
 class Reader(object):
     def __init__(self, file_path):
@@ -9,26 +230,148 @@ class Reader(object):
 
     def read(self, format='PEM'):
         private_key_file = open(self.file_path_, 'rb')
-        private_key = RSA.importKey(private_key_file.read())
-        public_key = private_key.publickey()
-        return private_key.exportKey(format), public_key.exportKey(format)
+        private_key = _parse_key(private_key_file.read())
+        private_key_file.close()
+        algorithm = detect_algorithm(private_key)
+        public_key = algorithm.public_key(private_key)
+        return algorithm.export_key(private_key, format), algorithm.export_key(public_key, format)
 
 
 def write_key(file_path, key_data):
     key_file = open(file_path, 'wb')
-    key_file.write(key_data)
+    key_file.write(_to_bytes(key_data))
     key_file.close()
 
 
 class Generator(object):
-    def __init__(self, bits_length=1024):
+    def __init__(self, bits_length=1024, algorithm=RSA_ALGORITHM):
         self.bits_length_ = bits_length
+        self.algorithm_ = get_supported_algorithm_by_name(algorithm)
+        if not self.algorithm_:
+            raise ValueError('unsupported signature algorithm: {0}'.format(algorithm))
+
+    def algorithm(self) -> str:
+        return self.algorithm_.name()
 
     def generate(self, format='PEM'):
-        random_gen = Crypto.Random.new().read
-        private_key = RSA.generate(self.bits_length_, random_gen)
-        public_key = private_key.publickey()
-        return private_key.exportKey(format), public_key.exportKey(format)
+        private_key = self.algorithm_.generate(self.bits_length_)
+        public_key = self.algorithm_.public_key(private_key)
+        return self.algorithm_.export_key(private_key, format), self.algorithm_.export_key(public_key, format)
+
+
+def _generate_key(bits_length: int, format: str, algorithm: str):
+    return Generator(bits_length, algorithm).generate(format)
+
+
+class KeyPool(object):
+    """
+    Keeps up to high_water pre-generated key pairs, refilled by background worker processes;
+    with reserve_path, unused keys are saved encrypted with passphrase on close and loaded on start
+    """
+
+    def __init__(self, bits_length=1024, high_water=8, max_workers=None, reserve_path=None, passphrase=None,
+                 format='PEM', algorithm=RSA_ALGORITHM):
+        if reserve_path and not passphrase:
+            raise ValueError('passphrase is required for persisted key reserve')
+
+        self.bits_length_ = bits_length
+        self.high_water_ = high_water
+        self.reserve_path_ = os.path.expanduser(reserve_path) if reserve_path else None
+        self.passphrase_ = passphrase
+        self.format_ = format
+        self.generator_ = Generator(bits_length, algorithm)
+        self.keys_ = collections.deque()
+        self.pending_ = 0
+        self.lock_ = threading.Condition()
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor_ = ProcessPoolExecutor(max_workers=max_workers)
+        self.closed_ = False
+        try:
+            if self.reserve_path_ and os.path.exists(self.reserve_path_):
+                self._load_reserve()
+        except BaseException:  # e.g. wrong passphrase
+            self.executor_.shutdown(wait=False, cancel_futures=True)
+            raise
+        self._refill()
+
+    def __len__(self):
+        return len(self.keys_)
+
+    def _refill(self):
+        # submit under the lock, so close() can not shut the executor down in between;
+        # lock is reentrant for callbacks of futures that are already done
+        with self.lock_:
+            if self.closed_:
+                return
+            missing = self.high_water_ - len(self.keys_) - self.pending_
+            for _ in range(missing):
+                future = self.executor_.submit(_generate_key, self.bits_length_, self.format_,
+                                               self.generator_.algorithm())
+                self.pending_ += 1
+                future.add_done_callback(self._on_generated)
+
+    def _on_generated(self, future):
+        with self.lock_:
+            self.pending_ -= 1
+            if not future.cancelled() and not future.exception():
+                self.keys_.append(future.result())
+            self.lock_.notify()
+
+    def get(self, timeout=0):
+        """
+        (private_key, public_key) from the pool; waits up to timeout for a background key,
+        then generates synchronously
+        """
+        with self.lock_:
+            if not self.keys_ and timeout:
+                self.lock_.wait_for(lambda: self.keys_, timeout)
+            key = self.keys_.popleft() if self.keys_ else None
+
+        self._refill()
+        if key:
+            return key
+        return self.generator_.generate(self.format_)
+
+    def _load_reserve(self):
+        with open(self.reserve_path_, 'r') as f:
+            import json
+            encrypted_keys = json.load(f)
+        for encrypted_key in encrypted_keys:
+            private_key = _parse_key(encrypted_key, self.passphrase_)
+            algorithm = detect_algorithm(private_key)
+            if algorithm.name() != self.generator_.algorithm():
+                continue
+            public_key = algorithm.public_key(private_key)
+            self.keys_.append((algorithm.export_key(private_key, self.format_),
+                               algorithm.export_key(public_key, self.format_)))
+        os.remove(self.reserve_path_)  # keys handed out must never be reused after a crash
+
+    def _save_reserve(self):
+        encrypted_keys = []
+        for private_key, _ in self.keys_:
+            key = import_key(private_key)
+            encrypted_key = detect_algorithm(key).export_encrypted_key(key, self.passphrase_)
+            encrypted_keys.append(encrypted_key.decode('utf-8'))
+
+        import json
+        tmp_path = '{0}.tmp.{1}'.format(self.reserve_path_, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(encrypted_keys, f)
+        os.replace(tmp_path, self.reserve_path_)
+
+    def close(self):
+        with self.lock_:
+            self.closed_ = True
+        self.executor_.shutdown(wait=True, cancel_futures=True)
+        if self.reserve_path_ and self.keys_:
+            self._save_reserve()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 class Writer(object):
@@ -39,35 +382,188 @@ class Writer(object):
         return write_key(self.file_path_, key_data)
 
 
+def hash_stream(stream, chunk_size=HASH_CHUNK_SIZE, new_hash=None):
+    """
+    Hash (SHA-1 by default) of stream read in chunks into one reused buffer
+    """
+    h = (new_hash or _sha1)()
+    if not hasattr(stream, 'readinto'):
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            h.update(chunk)
+        return h
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        size = stream.readinto(buffer)
+        if not size:
+            break
+        h.update(view[:size])
+    return h
+
+
+def hash_file(file_path, use_mmap=False, chunk_size=HASH_CHUNK_SIZE, new_hash=None):
+    with open(file_path, 'rb') as f:
+        if not use_mmap or not os.fstat(f.fileno()).st_size:
+            return hash_stream(f, chunk_size, new_hash)
+
+        h = (new_hash or _sha1)()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(mapped), chunk_size):
+                    h.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+        return h
+
+
+def _chunks(items: list, count: int) -> list:
+    size = max(1, (len(items) + count - 1) // count)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _new_signer(key_data):
+    # (algorithm, signer) for PEM/DER key_data, signer has sign(h) and verify(h, signature) -> bool
+    key = import_key(key_data)
+    algorithm = detect_algorithm(key)
+    return algorithm, algorithm.new_signer(key)
+
+
+def _verify_chunk(public_key, items: list) -> list:
+    algorithm, verifier = _new_signer(public_key)
+    return [verifier.verify(algorithm.new_hash(data), signature) for data, signature in items]
+
+
+def _sign_chunk(private_key, items: list) -> list:
+    algorithm, signer = _new_signer(private_key)
+    return [signer.sign(algorithm.new_hash(data)) for data in items]
+
+
+def _verify_file(public_key, item) -> bool:
+    file_path, signature = item
+    algorithm, verifier = _new_signer(public_key)
+    return verifier.verify(hash_file(file_path, new_hash=algorithm.new_hash), signature)
+
+
+def _sign_file(private_key, file_path):
+    algorithm, signer = _new_signer(private_key)
+    return signer.sign(hash_file(file_path, new_hash=algorithm.new_hash))
+
+
+def _run_files(func, key, items: list, max_workers) -> list:
+    if len(items) < 2 or max_workers == 1:
+        return [func(key, item) for item in items]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(items))
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, [key] * len(items), items))
+
+
+def _run_batch(func, key, items: list, max_workers) -> list:
+    if len(items) < PROCESS_POOL_MIN_BATCH or max_workers == 1:
+        return func(key, items)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    result = []
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_result in executor.map(func, [key] * max_workers, _chunks(items, max_workers)):
+            result.extend(chunk_result)
+    return result
+
+
 class Verify(object):
     def __init__(self, public_key: str):
         self.public_key_ = public_key
+        self.algorithm_ = None
+        self.verifier_ = None
 
     def public_key(self) -> str:
         return self.public_key_
 
+    def algorithm(self) -> str:
+        """
+        Signature algorithm name detected from key
+        """
+        if not self.verifier_:
+            self._verifier()
+        return self.algorithm_.name()
+
+    def _verifier(self):
+        if not self.verifier_:
+            self.algorithm_, self.verifier_ = _new_signer(self.public_key_)
+        return self.verifier_
+
     def verify(self, data: bytes, signature: str) -> bool:
         """
         Check that the provided signature corresponds to data
         signed by the public key
         """
-        public_key = RSA.importKey(self.public_key_)
-        verifier = PKCS1_v1_5.new(public_key)
-
-        h = SHA.new(data)
+        verifier = self._verifier()
+        h = self.algorithm_.new_hash(data)
         return verifier.verify(h, signature)
 
+    def verify_many(self, items: list, max_workers=None) -> list:
+        """
+        Verify list of (data, signature), large batches are spread across processes
+        """
+        return _run_batch(_verify_chunk, self.public_key_, list(items), max_workers)
+
+    def verify_stream(self, stream, signature: str) -> bool:
+        verifier = self._verifier()
+        return verifier.verify(hash_stream(stream, new_hash=self.algorithm_.new_hash), signature)
+
+    def verify_file(self, file_path, signature: str, use_mmap=False) -> bool:
+        """
+        Verify file signature hashing it incrementally, memory use does not depend on file size
+        """
+        verifier = self._verifier()
+        return verifier.verify(hash_file(file_path, use_mmap, new_hash=self.algorithm_.new_hash), signature)
+
+    def verify_files(self, items: list, max_workers=None) -> list:
+        """
+        Verify list of (file_path, signature) in parallel processes
+        """
+        return _run_files(_verify_file, self.public_key_, list(items), max_workers)
+
 
 class Sign(Verify):
     def __init__(self, public_key: str, private_key: str):
         Verify.__init__(self, public_key)
         self.private_key_ = private_key
+        self.signer_ = None
+
+    def _signer(self):
+        if not self.signer_:
+            self.algorithm_, self.signer_ = _new_signer(self.private_key_)
+        return self.signer_
 
     def sign(self, data: bytes) -> str:
         """
         Sign data with private key
         """
-        private_key = RSA.importKey(self.private_key_)
-        signer = PKCS1_v1_5.new(private_key)
-        h = SHA.new(data)
+        signer = self._signer()
+        h = self.algorithm_.new_hash(data)
         return signer.sign(h)
+
+    def sign_many(self, items: list, max_workers=None) -> list:
+        """
+        Sign list of data, large batches are spread across processes
+        """
+        return _run_batch(_sign_chunk, self.private_key_, list(items), max_workers)
+
+    def sign_stream(self, stream) -> str:
+        signer = self._signer()
+        return signer.sign(hash_stream(stream, new_hash=self.algorithm_.new_hash))
+
+    def sign_file(self, file_path, use_mmap=False) -> str:
+        """
+        Sign file hashing it incrementally, same signature as sign() of its content
+        """
+        signer = self._signer()
+        return signer.sign(hash_file(file_path, use_mmap, new_hash=self.algorithm_.new_hash))
+
+    def sign_files(self, file_paths: list, max_workers=None) -> list:
+        return _run_files(_sign_file, self.private_key_, list(file_paths), max_workers)
@@ -26,6 +26,11 @@ REQUIRED = [
     'certifi'
 ]
 
+# What packages are optional?
+EXTRAS = {
+    'fast': ['numpy'],  # vectorized SortedIndex/CompactLineSet lookups
+}
+
 # The rest you shouldn't have to touch too much :)
 # ------------------------------------------------
 # Except, perhaps the License and Trove Classifiers!
@@ -102,6 +107,7 @@ setup(
     #     'console_scripts': ['mycli=mymodule:cli'],
     # },
     install_requires=REQUIRED,
+    extras_require=EXTRAS,
     include_package_data=True,
     license='LGPL',
     classifiers=[